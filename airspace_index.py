@@ -0,0 +1,181 @@
+# airspace_index.py
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+from frequency_retrieval import safe_parse_frequencies
+
+AIRSPACE_FILE = "openaip_data/de_asp.geojson"
+
+# OpenAIP airspace type codes
+AIRSPACE_TYPES = {
+    0: "OTHER", 1: "RESTRICTED", 2: "DANGER", 3: "PROHIBITED", 4: "CTR", 5: "TMZ", 6: "RMZ",
+    7: "TMA", 8: "TRA", 9: "TSA", 10: "FIR", 13: "ATZ", 21: "GLIDING SECTOR", 26: "CTA",
+    28: "AERIAL SPORTING", 32: "VFR SECTOR", 33: "FIS SECTOR",
+}
+FIS_TYPES = {33}
+CONTROLLED_TYPES = {4, 5, 6, 7, 13, 26}
+DEFAULT_TYPES = FIS_TYPES | CONTROLLED_TYPES
+
+# OpenAIP limit units / reference datums
+UNIT_METER, UNIT_FEET, UNIT_FL = 0, 1, 6
+DATUM_GND, DATUM_MSL, DATUM_STD = 0, 1, 2
+
+BAND_FT = 1000
+MAX_BAND_FT = 20000
+UNLIMITED_FT = 99999
+
+
+def limit_to_feet(limit):
+    # GND-referenced limits are treated as MSL: the snapshot carries no terrain model,
+    # and German GA terrain is low enough for this to only widen bands slightly.
+    if isinstance(limit, str):
+        try:
+            limit = json.loads(limit)  # GDAL hands nested properties back as JSON strings
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(limit, dict):
+        return None
+    value = float(limit.get("value", 0) or 0)
+    unit = limit.get("unit", UNIT_FEET)
+    if unit == UNIT_FL:
+        return value * 100
+    if unit == UNIT_METER:
+        return value * 3.28084
+    return value
+
+
+def load_airspaces(path=AIRSPACE_FILE):
+    airspaces = gpd.read_file(path)
+    airspaces = airspaces[airspaces.geometry.type == "Polygon"].set_geometry("geometry").to_crs(epsg=4326)
+    return airspaces.reset_index(drop=True)
+
+
+def airspaces_from_features(features):
+    # GeoJSON features (e.g. fresh from the OpenAIP API) -> same table shape as load_airspaces
+    airspaces = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+    if airspaces.empty:
+        return airspaces
+    return airspaces[airspaces.geometry.type == "Polygon"].reset_index(drop=True)
+
+
+def _row_values(airspaces):
+    # The per-row Python parsing, the slow part of building an index
+    types = airspaces["type"].to_numpy(dtype=int) if "type" in airspaces else np.zeros(len(airspaces), dtype=int)
+    missing = [None] * len(airspaces)
+    lower = [limit_to_feet(v) for v in airspaces.get("lowerLimit", missing)]
+    upper = [limit_to_feet(v) for v in airspaces.get("upperLimit", missing)]
+    lower_ft = np.array([0.0 if v is None else v for v in lower], dtype=float)
+    upper_ft = np.array([UNLIMITED_FT if v is None else v for v in upper], dtype=float)
+    frequencies = [safe_parse_frequencies(v) for v in airspaces.get("frequencies", missing)]
+    return types, lower_ft, upper_ft, frequencies
+
+
+class AirspaceIndex:
+    def __init__(self, airspaces, values=None):
+        self.airspaces = airspaces
+        self.geoms = np.asarray(airspaces.geometry.values)
+        self.tree = shapely.STRtree(self.geoms)
+        self.types, self.lower_ft, self.upper_ft, self.frequencies = values or _row_values(airspaces)
+
+        # Precomputed candidate masks: one per type, one per 1000 ft band
+        self.type_masks = {t: self.types == t for t in np.unique(self.types)}
+        self.band_masks = [
+            (self.lower_ft < band + BAND_FT) & (self.upper_ft >= band)
+            for band in range(0, MAX_BAND_FT + BAND_FT, BAND_FT)
+        ]
+
+    def with_changes(self, upserts, removed_ids=()):
+        # New index with rows replaced/added from `upserts` and `removed_ids` dropped. Untouched
+        # rows keep their parsed limits and frequencies; only the tree and masks are rebuilt.
+        touched = set(removed_ids) | set(upserts["_id"] if "_id" in upserts else [])
+        keep = ~self.airspaces["_id"].isin(touched).to_numpy()
+        types, lower_ft, upper_ft, frequencies = _row_values(upserts)
+        airspaces = pd.concat([self.airspaces[keep], upserts], ignore_index=True)
+        return AirspaceIndex(gpd.GeoDataFrame(airspaces, geometry="geometry", crs=self.airspaces.crs), (
+            np.concatenate([self.types[keep], types]).astype(int),
+            np.concatenate([self.lower_ft[keep], lower_ft]),
+            np.concatenate([self.upper_ft[keep], upper_ft]),
+            [f for f, k in zip(self.frequencies, keep) if k] + frequencies,
+        ))
+
+    def candidate_mask(self, altitude_ft=None, types=DEFAULT_TYPES):
+        mask = np.zeros(len(self.types), dtype=bool)
+        for t in types or self.type_masks:
+            if t in self.type_masks:
+                mask |= self.type_masks[t]
+        if altitude_ft is not None:
+            band = min(int(altitude_ft // BAND_FT), len(self.band_masks) - 1)
+            mask &= self.band_masks[max(band, 0)]
+            mask &= (self.lower_ft <= altitude_ft) & (self.upper_ft >= altitude_ft)
+        return mask
+
+    def query(self, route_points, altitude_ft=None, types=DEFAULT_TYPES, buffer_deg=0.01):
+        # Returns (point index, airspace row) pairs in route order
+        if not route_points:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        coords = np.array([(p.x, p.y) for p in route_points])
+        buffered = shapely.buffer(shapely.points(coords), buffer_deg)
+
+        # Bounding-box candidates first, then drop wrong types / altitudes
+        # before running the exact polygon test on what's left
+        point_idx, geom_idx = self.tree.query(buffered)
+        keep = self.candidate_mask(altitude_ft, types)[geom_idx]
+        point_idx, geom_idx = point_idx[keep], geom_idx[keep]
+        hit = shapely.intersects(buffered[point_idx], self.geoms[geom_idx])
+        point_idx, geom_idx = point_idx[hit], geom_idx[hit]
+
+        order = np.lexsort((geom_idx, point_idx))
+        return point_idx[order], geom_idx[order]
+
+    def frequencies_along(self, route_points, altitude_ft=None, types=DEFAULT_TYPES):
+        # Same shape as frequency_retrieval.get_ordered_frequencies
+        return self.frequencies_by_leg(route_points, [0] * len(route_points), altitude_ft, types)[0]
+
+    def frequencies_by_leg(self, route_points, leg_ids, altitude_ft=None, types=DEFAULT_TYPES):
+        legs = [OrderedDict() for _ in range(max(leg_ids) + 1 if leg_ids else 1)]
+        point_idx, geom_idx = self.query(route_points, altitude_ft, types)
+
+        seen = set()
+        for p, i in zip(point_idx.tolist(), geom_idx.tolist()):
+            leg = leg_ids[p]
+            if (leg, i) in seen:
+                continue
+            seen.add((leg, i))
+
+            for freq_obj in self.frequencies[i]:
+                name = freq_obj.get("name", "").strip()
+                value = freq_obj.get("value", "").strip()
+                if not name or not value or name.upper() == "UNKNOWN":
+                    continue
+
+                key = (name, value)
+                if key not in legs[leg]:
+                    legs[leg][key] = {
+                        "name": name,
+                        "frequency": f"{value} MHz",
+                        "phase": "Enroute / Cruise",
+                        "airspace_type": AIRSPACE_TYPES.get(self.types[i], str(self.types[i])),
+                    }
+        return legs
+
+
+_index = {"current": None}
+_lock = threading.Lock()
+
+
+def get_airspace_index():
+    with _lock:
+        if _index["current"] is None:
+            _index["current"] = AirspaceIndex(load_airspaces())
+        return _index["current"]
+
+
+def set_airspace_index(index):
+    # Single reference swap: queries already running finish on the index they started with
+    with _lock:
+        _index["current"] = index
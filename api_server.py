@@ -0,0 +1,197 @@
+# api_server.py
+import os
+import json
+import asyncio
+import weakref
+import tempfile
+import msgpack
+import numpy as np
+import uvicorn
+import gradio as gr
+from fastapi import FastAPI, File, Form, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+
+import app as atc_app
+from longform_transcription import transcribe_long_recording
+from position_reports import describe_position
+
+MSGPACK = "application/msgpack"
+MAX_CONCURRENCY = int(os.getenv("ATC_API_MAX_CONCURRENCY", "4"))
+QUEUE_TIMEOUT = float(os.getenv("ATC_API_QUEUE_TIMEOUT", "10"))
+
+api = FastAPI(title="ATCopilot API")
+
+# Inference-bound endpoints share one limit; requests that can't get a slot in time get a 429
+_inference_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+
+class _Busy(Exception):
+    pass
+
+
+@api.exception_handler(_Busy)
+async def _busy_handler(request, exc):
+    return JSONResponse({"error": "Server busy, retry later."}, status_code=429)
+
+
+async def _acquire_slot():
+    try:
+        await asyncio.wait_for(_inference_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _Busy()
+
+
+def _release_upload(loop, path):
+    # May run on any thread (GC finalizer); asyncio.Semaphore is only touched on its loop
+    loop.call_soon_threadsafe(_inference_slots.release)
+    os.remove(path)
+
+
+def _respond(request, payload, status_code=200):
+    if MSGPACK in request.headers.get("accept", ""):
+        return Response(msgpack.packb(payload, use_bin_type=True), status_code=status_code, media_type=MSGPACK)
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def _read_body(request):
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith(MSGPACK):
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body or b"{}")
+
+
+async def _save_upload(upload):
+    suffix = os.path.splitext(upload.filename or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while chunk := await upload.read(1 << 20):
+            tmp.write(chunk)
+        return tmp.name
+
+
+@api.get("/health")
+async def health(request: Request):
+    return _respond(request, {
+        "status": "ok",
+        "asr_pool": atc_app.asr_pool.health() if atc_app.asr_pool is not None else None,
+        "cache": atc_app.transcript_cache.stats(),
+    })
+
+
+@api.post("/transcribe")
+async def transcribe(request: Request, audio: UploadFile = File(...), callsign: str = Form(...), language: str = Form("en")):
+    # Slot first: a 429 then never leaves an upload behind
+    await _acquire_slot()
+    path = None
+    try:
+        path = await _save_upload(audio)
+        transcription, extracted_cs, response = await run_in_threadpool(atc_app.process_input, path, callsign, language)
+    finally:
+        _inference_slots.release()
+        if path is not None:
+            os.remove(path)
+
+    if transcription == atc_app.BUSY_MESSAGE:
+        # Same answer as when no inference slot is free
+        raise _Busy()
+    if transcription == atc_app.ASR_FAILED_MESSAGE:
+        return _respond(request, {"error": transcription}, status_code=503)
+
+    return _respond(request, {
+        "transcription": transcription,
+        "callsign": extracted_cs,
+        "response": response,
+    })
+
+
+@api.post("/transcribe/long")
+async def transcribe_long(audio: UploadFile = File(...), language: str = Form("en")):
+    # Streams one NDJSON line per transmission as soon as its batch is decoded
+    await _acquire_slot()
+    try:
+        path = await _save_upload(audio)
+    except BaseException:
+        _inference_slots.release()
+        raise
+
+    def entries():
+        for entry in transcribe_long_recording(path, atc_app.transcribe_waveforms, atc_app.vad_model,
+                                               atc_app.get_speech_timestamps, language):
+            yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+    async def stream():
+        try:
+            async for line in iterate_in_threadpool(entries()):
+                yield line
+        finally:
+            cleanup()
+
+    body = stream()
+    # Runs once: when the stream ends, or when it is collected without ever being iterated
+    cleanup = weakref.finalize(body, _release_upload, asyncio.get_running_loop(), path)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+
+@api.post("/checklist")
+async def checklist(request: Request):
+    data = await _read_body(request)
+    try:
+        args = (
+            data["cs"], data.get("airplane_type", "C172"), int(data.get("num_pax", 1)),
+            data["dep"], data["arr"], data.get("position", ""),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return _respond(request, {"error": f"Invalid request: {e}"}, status_code=400)
+
+    result = await run_in_threadpool(atc_app.generate_checklist_from_form, *args)
+    if isinstance(result, str):
+        return _respond(request, {"error": result}, status_code=404)
+    return _respond(request, {"checklist": result})
+
+
+async def _position_report(text, language):
+    try:
+        data = json.loads(text)
+        lat, lon, altitude = float(data["lat"]), float(data["lon"]), float(data.get("altitude_ft", 0))
+    except (KeyError, TypeError, ValueError) as e:
+        return {"error": f"Invalid position: {e}"}
+    report = await run_in_threadpool(describe_position, lat, lon, altitude, language)
+    return {"position_report": report}
+
+
+@api.websocket("/live")
+async def live(websocket: WebSocket):
+    # Binary frames: 16 kHz mono int16 PCM. Each frame is answered with the current transcript.
+    # Text frames {"lat": .., "lon": .., "altitude_ft": ..} from the client's GPS are answered
+    # with a suggested position report relative to the nearest airfield.
+    # ?callsign=D-EABC biases decoding towards that flight's plan, ?language=de for German reports
+    await websocket.accept()
+    callsign = websocket.query_params.get("callsign")
+    language = websocket.query_params.get("language", "en")
+    buffer_list = []
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is not None:
+                await websocket.send_json(await _position_report(message["text"], language))
+                continue
+            chunk = (16000, np.frombuffer(message["bytes"], dtype=np.int16))
+            await _acquire_slot()
+            try:
+                buffer_list, text = await run_in_threadpool(atc_app.live_stream, buffer_list, chunk, callsign)
+            finally:
+                _inference_slots.release()
+            await websocket.send_json({"text": text})
+    except WebSocketDisconnect:
+        pass
+    except _Busy:
+        await websocket.close(code=1013)
+
+
+# Gradio UI keeps working under /ui
+api = gr.mount_gradio_app(api, atc_app.demo, path="/ui")
+
+if __name__ == "__main__":
+    uvicorn.run(api, host=os.getenv("ATC_API_HOST", "0.0.0.0"), port=int(os.getenv("ATC_API_PORT", "8000")))
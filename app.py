@@ -1,102 +1,239 @@
+import os
+import time
+import queue
+import threading
 import gradio as gr
 import numpy as np
 import torch
-import librosa
 import geopandas as gpd
 import json
 from collections import OrderedDict
 from shapely.geometry import Point
 from transformers import AutoFeatureExtractor, AutoTokenizer, WhisperProcessor, WhisperForConditionalGeneration, pipeline
-from pydub import AudioSegment
 import torchaudio.transforms as T
 from transcription_utils import normalize_text_to_callsign, extract_context_from_transcript, get_icao_response, clean_transcript, strip_callsign_from_transcript, callsign_matches
 from icao_rules_en import ICAO_RULES_EN
 from icao_rules_de import ICAO_RULES_DE
 from flight_plan_utils import generate_checklist_from_form
-from faster_whisper import WhisperModel
+from route_planning import plan_multi_leg_route
 from silero_vad import load_silero_vad, get_speech_timestamps
 import re
 from live_transcription import start_transcription, stop_audio_stream, send_audio_stream
+from asr_models import MODEL_ID, CPU_OPTIONS, load_hf_model, load_rt_model, load_vad_model, transcribe_batch, transcribe_features
+from audio_frontend import AudioFrontEnd, FRONTEND_OPTIONS
+from asr_worker_pool import ASRWorkerPool
+from speculative_decoding import SpeculativeTranscriber, load_draft_model
+import audio_io
+from prompt_biasing import get_flight_bias
+from flight_state import get_flight_session
+from transcript_cache import TranscriptCache, audio_fingerprint
+from longform_transcription import transcribe_long_recording, format_log_entry
+from transmission_log import get_transmission_log, format_rows
+from language_id import get_language_prior, guess_text_language, transcribe_auto
+from multichannel_monitor import resolve_device
 import sounddevice as sd
 
-vad_model, utils = torch.hub.load(
-    repo_or_dir='snakers4/silero-vad',
-    model='silero_vad',
-    force_reload=False
-)
+vad_model, utils = load_vad_model()
 (get_speech_timestamps, _, read_audio, _, _) = utils
 
-sd.default.device = (1, None)  
+# Live capture device: ATC_INPUT_DEVICE=<index or name substring>, system default when unset.
+# Several receivers at once: multichannel_monitor.py
+input_device = resolve_device(os.getenv("ATC_INPUT_DEVICE"))
+if input_device is not None:
+    sd.default.device = (input_device, None)
 
 # Model setup
-MODEL_ID = "tclin/whisper-large-v3-turbo-atcosim-finetune"
-processor = WhisperProcessor.from_pretrained(MODEL_ID)
-model = WhisperForConditionalGeneration.from_pretrained(MODEL_ID)
-model.generation_config.forced_decoder_ids = None
-model.generation_config.pad_token_id = model.generation_config.eos_token_id
-
-# Real-time setup
-RTModel = WhisperModel(
-    "jacktol/whisper-medium.en-fine-tuned-for-ATC-faster-whisper",
-    device="cpu",
-    compute_type="int8"
-)
+# ATC_ASR_WORKERS > 0 moves offline inference into a process pool instead of the Gradio threads
+ASR_WORKERS = int(os.getenv("ATC_ASR_WORKERS", "0"))
+ASR_THREADS_PER_WORKER = int(os.getenv("ATC_ASR_THREADS_PER_WORKER", "2"))
+
+if ASR_WORKERS > 0:
+    asr_pool = ASRWorkerPool(
+        num_workers=ASR_WORKERS,
+        threads_per_worker=ASR_THREADS_PER_WORKER,
+        share_model=os.getenv("ATC_ASR_SHARE_MODEL", "0") == "1"
+    ).start()
+    processor, model = WhisperProcessor.from_pretrained(MODEL_ID), None
+else:
+    asr_pool = None
+    processor, model = load_hf_model(MODEL_ID)
+
+# ATC_SPECULATIVE=1: the medium ATC model drafts tokens, the large model verifies them.
+# Only for in-process inference, the pool batches clips and assisted generation cannot.
+speculative = None
+if asr_pool is None and os.getenv("ATC_SPECULATIVE", "0") == "1":
+    try:
+        speculative = SpeculativeTranscriber(processor, model, *load_draft_model())
+    except Exception as e:
+        print(f"❗ Could not load draft model ({e}), using plain decoding")
+
+# Radio clean-up + log-mel features, computed once per clip and shared by VAD, ASR and re-decodes
+frontend = AudioFrontEnd(processor.feature_extractor, denoise=FRONTEND_OPTIONS["denoise"]) if FRONTEND_OPTIONS["enabled"] else None
+
+# Real-time setup. CTranslate2 starts its thread pools on load, so the model is created on
+# first use in the process that serves it (never in the preload_server parent)
+_rt_model = {"current": None}
+_rt_lock = threading.Lock()
+
+
+def get_rt_model():
+    with _rt_lock:
+        if _rt_model["current"] is None:
+            _rt_model["current"] = load_rt_model()
+        return _rt_model["current"]
+
+
+# Returned by process_input instead of a transcription; api_server maps them to 429 / 503
+BUSY_MESSAGE = "Transcription service is busy, please try again."
+ASR_FAILED_MESSAGE = "Transcription failed, please try again."
+
+# Repeated uploads of the same clip skip inference entirely
+transcript_cache = TranscriptCache(max_entries=int(os.getenv("ATC_CACHE_ENTRIES", "512")))
 
 
 def load_audio(audio_path):
-    # Load and resample to 16000 Hz (Whisper expects 16kHz)
-    waveform, sr = librosa.load(audio_path, sr=16000)
-    return waveform, sr
+    # Decode and resample to 16000 Hz (Whisper expects 16kHz)
+    return audio_io.load_audio(audio_path, target_sr=16000)
 
 def process_input(audio, callsign, language):
-    response, intent = "", None
+    started = time.perf_counter()
+    response, intent, asr_ms = "", None, None
 
     if audio is None or callsign.strip() == "":
         return "No input received.", "", ""
 
     waveform, sample_rate = load_audio(audio)
 
-    # Prepare input WITHOUT specifying task or language
-    inputs = processor(
-        waveform,
-        sampling_rate=sample_rate,
-        return_tensors="pt"
-    )
-
-    with torch.no_grad():
-        predicted_ids = model.generate(inputs.input_features)  # No forced decoder IDs
-
-    transcription = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-    print(f"Raw transcription: {transcription}")
+    # Contextual biasing from the checklist form; prompt ids are cached per flight
+    bias = get_flight_bias(callsign)
+    generate_kwargs = {"prompt_ids": bias.prompt_ids(processor)} if bias else {}
+
+    cache_key = audio_fingerprint(waveform, MODEL_ID, {
+        "language": language,
+        "prompt": bias.prompt if bias else None,
+        "frontend": frontend.params if frontend is not None else None,
+        # int8 and compiled models can decode differently from the fp32 weights
+        "variant": {"quantize": CPU_OPTIONS["quantize"], "compile": CPU_OPTIONS["compile_model"],
+                    "speculative": speculative is not None},
+    })
+    cached = transcript_cache.get(cache_key)
+
+    if cached is not None:
+        transcription, extracted_cs, context = cached["transcription"], cached["callsign"], cached["context"]
+        language = cached.get("language", language)
+        print(f"Cache hit {cache_key[:12]}: {transcription}")
+    else:
+        # Cleaned audio goes through VAD first, so noise-only clips never reach the decoder.
+        # Pool workers compute their own features, so then only the cleaned audio is made here.
+        fe = frontend.process(waveform, sample_rate, features=asr_pool is None) if frontend is not None else None
+        if fe is not None and not get_speech_timestamps(fe.audio, vad_model, sampling_rate=16000):
+            return "No speech detected.", "", ""
+
+        # Prepare input WITHOUT specifying task or language (no forced decoder IDs)
+        asr_started = time.perf_counter()
+        if asr_pool is not None:
+            try:
+                transcription = asr_pool.transcribe(fe.audio if fe is not None else waveform, **generate_kwargs)
+            except queue.Full:
+                return BUSY_MESSAGE, "", ""
+            except (TimeoutError, RuntimeError) as e:
+                # Request expired in the queue, worker crashed, or the pool is shutting down
+                print(f"❗ ASR pool request failed: {e}")
+                return ASR_FAILED_MESSAGE, "", ""
+        elif language == "auto":
+            # Language ID and decode share one encoder pass; the flight's earlier calls act as prior
+            features = fe.input_features[None] if fe is not None else \
+                processor(waveform, sampling_rate=sample_rate, return_tensors="pt").input_features
+            transcription, language = transcribe_auto(processor, model, features, get_language_prior(callsign),
+                                                      speculative=speculative,
+                                                      waveform=fe.audio if fe is not None else waveform,
+                                                      sampling_rate=16000 if fe is not None else sample_rate,
+                                                      **generate_kwargs)
+        elif speculative is not None:
+            # The drafter computes its own features from the same (cleaned) audio
+            audio, rate = (fe.audio, 16000) if fe is not None else (waveform, sample_rate)
+            features = fe.input_features[None] if fe is not None else None
+            transcription = speculative.transcribe(audio, rate, input_features=features, **generate_kwargs)
+        elif fe is not None:
+            transcription = transcribe_features(processor, model, fe.input_features[None], **generate_kwargs)[0]
+        else:
+            transcription = transcribe_batch(processor, model, [waveform], sample_rate, **generate_kwargs)[0]
+        asr_ms = (time.perf_counter() - asr_started) * 1000
+        print(f"Raw transcription: {transcription}")
+
+        if language == "auto":
+            # Pool workers only return text, so route by the words instead
+            language = guess_text_language(transcription, get_language_prior(callsign))
+            print(f"Detected language from text: {language}")
+
+        extracted_cs = normalize_text_to_callsign(transcription)
+        print(f"Normalized text: {extracted_cs}")
+        print(f"Input callsign: {callsign}")
+
+        transcription = clean_transcript(transcription)
+        print(f"Transcription: {transcription}")
+
+        context = extract_context_from_transcript(transcription, language)
+        print(f"Extracted context: {context}")
+
+        transcript_cache.put(cache_key, {"transcription": transcription, "callsign": extracted_cs, "context": context,
+                                         "language": language})
 
-    extracted_cs = normalize_text_to_callsign(transcription)
-    print(f"Normalized text: {extracted_cs}")
-    print(f"Input callsign: {callsign}")
-    
-    transcription = clean_transcript(transcription)
-    print(f"Transcription: {transcription}")
-
-    context = extract_context_from_transcript(transcription, language)
-    print(f"Extracted context: {context}")
-    
     if callsign_matches(callsign, extracted_cs):
         cleaned = strip_callsign_from_transcript(transcription, callsign, ICAO_RULES_EN if language == "en" else ICAO_RULES_DE)
-        response, intent = get_icao_response(cleaned, callsign, context, language)
-        print(f"Generated response: {response}")
+        session = get_flight_session(callsign, language)
+        response, intent = get_icao_response(cleaned, callsign, context, language, session=session)
+        print(f"Generated response: {response} (phase: {session.phase})")
     
     if not response:
         response = "No relevant transmission detected for your callsign."
 
+    get_transmission_log().log(
+        callsign=extracted_cs or callsign, transcript=transcription, intent=intent, response=response,
+        context=context, session=callsign, source="upload", asr_ms=asr_ms,
+        total_ms=(time.perf_counter() - started) * 1000,
+    )
     return transcription, extracted_cs, response
 
-def live_stream(buffer_list, new_chunk):
+def transcribe_waveforms(waveforms):
+    if frontend is not None:
+        # Long-form segments are decoded once, so they stay out of the frontend's LRU
+        results, features = frontend.process_batch(waveforms, features=asr_pool is None, cache=False)
+        if asr_pool is None:
+            return transcribe_features(processor, model, features)
+        waveforms = [r.audio for r in results]
+    if asr_pool is not None:
+        futures = [asr_pool.submit(w) for w in waveforms]
+        return [f.result(timeout=asr_pool.request_timeout) for f in futures]
+    return transcribe_batch(processor, model, waveforms)
+
+def process_long_recording(audio, language):
+    if audio is None:
+        yield "No input received."
+        return
+
+    lines = []
+    session = f"recording-{int(time.time())}"
+    for entry in transcribe_long_recording(audio, transcribe_waveforms, vad_model, get_speech_timestamps, language):
+        get_transmission_log().log(
+            callsign=entry["callsign"], transcript=entry["transcript"], intent=entry["intent"],
+            context=entry["context"], session=session, source="recording",
+        )
+        line = format_log_entry(entry)
+        print(line)
+        lines.append(line)
+        yield "\n".join(lines)
+
+    if not lines:
+        yield "No speech detected in recording."
+
+def live_stream(buffer_list, new_chunk, callsign=None):
     if new_chunk is None:
         return buffer_list, ""
     sr, audio = new_chunk
 
-    if audio.ndim > 1:
-        audio = audio.mean(axis=1)
-    audio = librosa.resample(audio.astype(np.float32), orig_sr=sr, target_sr=16000)
+    audio = audio_io.to_mono(audio_io.to_float32(audio))
+    audio = audio_io.resample(audio, orig_sr=sr, target_sr=16000)
     buffer_list.append(audio)
     buffer = np.concatenate(buffer_list)
     if buffer.shape[0] > 15 * 16000:
@@ -106,18 +243,23 @@ def live_stream(buffer_list, new_chunk):
     # Use Silero VAD to extract speech intervals
     speech_ts = get_speech_timestamps(buffer, vad_model, sampling_rate=16000)
 
+    rt_model = get_rt_model()
+    bias = get_flight_bias(callsign)
+    initial_prompt = bias.rt_prompt_tokens(rt_model) if bias else None
+
     full_text = ""
     for seg in speech_ts:
         start, end = seg['start'], seg['end']
         chunk = buffer[start:end]
 
-        segments, _ = RTModel.transcribe(
+        segments, _ = rt_model.transcribe(
             chunk,
             beam_size=1,
             temperature=0,
             no_speech_threshold=0.2,
             condition_on_previous_text=False,
             vad_filter=False,
+            initial_prompt=initial_prompt,
             language="en"
         )
         for s in segments:
@@ -177,12 +319,20 @@ with gr.Blocks() as demo:
 
     with gr.Tab("Live Transcription"):
         live_output = gr.Textbox(label="Live Transcription", lines=10)
+        live_feedback = gr.Textbox(label="Initial Call Check", lines=4)
+        live_language = gr.Radio(["en", "de", "auto"], label="Language", value=os.getenv("ATC_REALTIME_LANGUAGE", "en"))
+        live_callsign = gr.Textbox(label="Your callsign (optional, e.g., D-EABC)")
         start_button = gr.Button("Start Live Transcription")
         stop_button = gr.Button("Stop")
         status = gr.Textbox(label="Status")
 
-        def start():
-            start_transcription(live_output)
+        # The realtime client appends from its own thread; the boxes are refreshed from these lists
+        live_lines, live_checks = [], []
+
+        def start(language, callsign):
+            live_lines.clear()
+            live_checks.clear()
+            start_transcription(live_lines, live_checks, language=language, callsign=callsign.strip() or None)
             return gr.update(value="🔴 Listening..."), "🔴 Listening..."
 
         def stop():
@@ -191,8 +341,10 @@ with gr.Blocks() as demo:
 
         status = gr.Textbox(label="Status")
 
-        start_button.click(fn=start, outputs=[live_output, status])
+        start_button.click(fn=start, inputs=[live_language, live_callsign], outputs=[live_output, status])
         stop_button.click(fn=stop, outputs=[live_output, status])
+        gr.Timer(1.0).tick(fn=lambda: ("\n".join(live_lines[-50:]), "\n".join(live_checks[-10:])),
+                           outputs=[live_output, live_feedback])
 
     # First Tab: Transcription
     with gr.Tab("Transcription"):
@@ -200,7 +352,7 @@ with gr.Blocks() as demo:
             with gr.Column():
                 audio_input = gr.Audio(type="filepath", label="Speak your transmission")
                 callsign_input = gr.Textbox(label="Your callsign (e.g., D-EABC)")
-                language_input = gr.Radio(["en", "de"], label="Language", value="en")
+                language_input = gr.Radio(["en", "de", "auto"], label="Language", value="en")
             with gr.Column():
                 transcription_output = gr.Textbox(label="Transcription")
                 callsign_output = gr.Textbox(label="Extracted Callsign")
@@ -209,7 +361,50 @@ with gr.Blocks() as demo:
         transcribe_btn.click(
             fn=process_input,
             inputs=[audio_input, callsign_input, language_input],
-            outputs=[transcription_output, callsign_output, response_output]
+            outputs=[transcription_output, callsign_output, response_output],
+            # With the worker pool the handlers only wait on futures, so let them overlap
+            concurrency_limit=None if asr_pool is not None else 1
+        )
+
+        with gr.Accordion("Transcript cache", open=False):
+            cache_stats_output = gr.JSON(label="Cache statistics")
+            cache_stats_btn = gr.Button("Refresh")
+            cache_stats_btn.click(fn=transcript_cache.stats, outputs=[cache_stats_output])
+
+    with gr.Tab("Flight Recording Log"):
+        with gr.Row():
+            with gr.Column():
+                recording_input = gr.Audio(type="filepath", label="Full flight recording")
+                recording_language = gr.Radio(["en", "de", "auto"], label="Language", value="en")
+                recording_btn = gr.Button("Build Transmission Log")
+            with gr.Column():
+                recording_output = gr.Textbox(label="Transmission Log", lines=20)
+        recording_btn.click(
+            fn=process_long_recording,
+            inputs=[recording_input, recording_language],
+            outputs=[recording_output]
+        )
+
+    with gr.Tab("Transmission Search"):
+        with gr.Row():
+            search_callsign = gr.Textbox(label="Callsign")
+            search_intent = gr.Textbox(label="Intent")
+            search_frequency = gr.Textbox(label="Frequency")
+            search_text = gr.Textbox(label="Text")
+            search_limit = gr.Number(label="Max results", value=100)
+        search_btn = gr.Button("Search")
+        search_output = gr.Textbox(label="Transmissions", lines=20)
+        search_stats = gr.JSON(label="Log statistics")
+
+        def search_transmissions(callsign, intent, frequency, text, limit):
+            rows = get_transmission_log().search(callsign=callsign.strip(), intent=intent.strip(), frequency=frequency.strip(),
+                                           text=text.strip(), limit=int(limit or 100))
+            return format_rows(rows) or "No transmissions found.", get_transmission_log().counts()
+
+        search_btn.click(
+            fn=search_transmissions,
+            inputs=[search_callsign, search_intent, search_frequency, search_text, search_limit],
+            outputs=[search_output, search_stats]
         )
 
     # ✅ Second Tab: Checklist Generator
@@ -223,6 +418,7 @@ with gr.Blocks() as demo:
             dep = gr.Textbox(label="Departure ICAO", value="EDFE")
             arr = gr.Textbox(label="Arrival ICAO", value="EDFN")
             position = gr.Textbox(label="Start Position", value="Vorfeld A")
+            cruise_altitude = gr.Number(label="Cruise Altitude (ft, 0 = any)", value=0)
 
         with gr.Tab("Checklist"):
             checklist_display = checklist_markdown({})
@@ -236,9 +432,34 @@ with gr.Blocks() as demo:
             checklist_display = gr.Markdown()
             submit.click(
                 fn=wrapper_generate_and_render,
-                inputs=[cs, airplane_type, num_pax, dep, arr, position],
+                inputs=[cs, airplane_type, num_pax, dep, arr, position, cruise_altitude],
                 outputs=[checklist_display]
             )
 
+        with gr.Tab("Multi-Leg Route"):
+            route_input = gr.Textbox(
+                label="Route (airports are stops, 'NAME lat lon' are reporting points)",
+                value="EDFE; KILO 49.98 8.70; EDFN",
+                lines=3
+            )
+            route_submit = gr.Button("Generate Multi-Leg Checklist")
+            route_display = gr.Markdown()
+
+            def wrapper_plan_and_render(cs, airplane_type, num_pax, route, position, altitude):
+                plan = plan_multi_leg_route(cs, airplane_type, num_pax, route, position, altitude)
+                if isinstance(plan, str):
+                    return plan
+                markdown = "### Frequency handoffs\n"
+                markdown += "".join(f"- Leg {leg}: {name} {value} MHz\n" for leg, name, value in plan["handoffs"])
+                for title, checklist_dict in plan["legs"].items():
+                    markdown += f"\n## {title}\n" + checklist_markdown(checklist_dict)
+                return markdown
+
+            route_submit.click(
+                fn=wrapper_plan_and_render,
+                inputs=[cs, airplane_type, num_pax, route_input, position, cruise_altitude],
+                outputs=[route_display]
+            )
+
 if __name__ == "__main__":
     demo.launch()
\ No newline at end of file
@@ -0,0 +1,85 @@
+# asr_models.py
+import os
+import time
+import numpy as np
+import torch
+from transformers import WhisperProcessor, WhisperForConditionalGeneration
+from faster_whisper import WhisperModel
+
+MODEL_ID = "tclin/whisper-large-v3-turbo-atcosim-finetune"
+RT_MODEL_ID = "jacktol/whisper-medium.en-fine-tuned-for-ATC-faster-whisper"
+SAMPLE_RATE = 16000
+
+# CPU inference settings, selectable per deployment:
+#   ATC_QUANTIZE=1       dynamic int8 quantization of all nn.Linear layers
+#   ATC_TORCH_THREADS=N  fixed intra-op thread count
+#   ATC_COMPILE=1        torch.compile the encoder (input shape is always 30 s of mel frames)
+#   ATC_WARMUP=1         run one static-shape generate() at load time
+CPU_OPTIONS = {
+    "quantize": os.getenv("ATC_QUANTIZE", "0") == "1",
+    "num_threads": int(os.getenv("ATC_TORCH_THREADS", "0")) or None,
+    "compile_model": os.getenv("ATC_COMPILE", "0") == "1",
+    "warmup": os.getenv("ATC_WARMUP", "0") == "1",
+}
+
+
+def load_hf_model(model_id=MODEL_ID, cpu_options=None):
+    processor = WhisperProcessor.from_pretrained(model_id)
+    model = WhisperForConditionalGeneration.from_pretrained(model_id)
+    model.generation_config.forced_decoder_ids = None
+    model.generation_config.pad_token_id = model.generation_config.eos_token_id
+    model.eval()
+    model = optimize_for_cpu(processor, model, **(CPU_OPTIONS if cpu_options is None else cpu_options))
+    return processor, model
+
+
+def optimize_for_cpu(processor, model, quantize=False, num_threads=None, compile_model=False, warmup=False):
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        print("Whisper linear layers quantized to int8")
+
+    if compile_model:
+        # Whisper pads every input to 3000 mel frames, so the encoder never sees a new shape
+        model.model.encoder = torch.compile(model.model.encoder, dynamic=False)
+
+    if warmup:
+        start = time.time()
+        transcribe_batch(processor, model, [np.zeros(SAMPLE_RATE, dtype=np.float32)])
+        print(f"Whisper warmup took {time.time() - start:.1f}s")
+
+    return model
+
+
+def load_rt_model(model_id=RT_MODEL_ID):
+    return WhisperModel(model_id, device="cpu", compute_type="int8")
+
+
+def load_vad_model():
+    vad_model, utils = torch.hub.load(
+        repo_or_dir='snakers4/silero-vad',
+        model='silero_vad',
+        force_reload=False
+    )
+    return vad_model, utils
+
+
+def transcribe_batch(processor, model, waveforms, sampling_rate=SAMPLE_RATE, **generate_kwargs):
+    # Whisper pads every clip to 30 s, so a list of waveforms becomes one static-shape batch
+    inputs = processor(
+        waveforms,
+        sampling_rate=sampling_rate,
+        return_tensors="pt"
+    )
+    return transcribe_features(processor, model, inputs.input_features, **generate_kwargs)
+
+
+def transcribe_features(processor, model, input_features, **generate_kwargs):
+    # Precomputed log-mel features (audio_frontend), shape (batch, n_mels, 3000)
+    input_features = torch.as_tensor(input_features)
+    with torch.inference_mode():
+        predicted_ids = model.generate(input_features, **generate_kwargs)
+
+    return processor.batch_decode(predicted_ids, skip_special_tokens=True)
@@ -0,0 +1,408 @@
+# asr_worker_pool.py
+import os
+import gc
+import time
+import queue
+import signal
+import socket
+import struct
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import Connection
+from collections import deque
+from concurrent.futures import Future
+
+from asr_models import MODEL_ID, SAMPLE_RATE, CPU_OPTIONS, load_hf_model, transcribe_batch
+
+HEARTBEAT_INTERVAL = 2.0
+
+# Models loaded in the parent before forking (share_model=True); children reuse
+# the pages copy-on-write instead of each holding a private copy of the weights
+_PRELOADED = {}
+
+
+def _heartbeat_loop(idx, gen, result_queue, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        result_queue.put(("heartbeat", idx, gen, None, None))
+
+
+def _worker_main(idx, gen, task_queue, result_queue, model_id, num_threads):
+    import torch
+
+    # Pin thread counts before the first op so workers don't oversubscribe the cores
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already initialised in this process
+
+    if model_id in _PRELOADED:
+        processor, model = _PRELOADED[model_id]
+    else:
+        # Thread count is owned by the pool, the remaining CPU options still apply
+        processor, model = load_hf_model(model_id, cpu_options={**CPU_OPTIONS, "num_threads": None})
+    result_queue.put(("ready", idx, gen, None, None))
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat_loop, args=(idx, gen, result_queue, stop), daemon=True).start()
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, waveforms, generate_kwargs = task
+        try:
+            texts = transcribe_batch(processor, model, waveforms, SAMPLE_RATE, **generate_kwargs)
+            result_queue.put(("result", idx, gen, batch_id, texts))
+        except Exception as e:
+            result_queue.put(("error", idx, gen, batch_id, repr(e)))
+
+    stop.set()
+
+
+def _spawner_main(sock, pool_sock, result_queue, model_id, num_threads):
+    # Forked by start() before the pool starts any thread, and never starts one itself, so it
+    # can keep forking replacement workers safely. They inherit the preloaded weights from it.
+    pool_sock.close()  # otherwise our own copy keeps the pool's end open and EOF never comes
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # the kernel reaps the replacements
+    while True:
+        data, fds, _, _ = socket.recv_fds(sock, 64, 1)
+        if not data:
+            return  # pool closed its end
+        idx, gen = struct.unpack("ii", data)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            sock.close()
+            code = 1
+            try:
+                _worker_main(idx, gen, _PipeQueue(Connection(fds[0], writable=False)),
+                             result_queue, model_id, num_threads)
+                code = 0
+            finally:
+                os._exit(code)
+        os.close(fds[0])
+        sock.send(struct.pack("i", pid))
+
+
+class _PipeQueue:
+    # Task channel of a respawned worker: a pipe whose read end was handed to the spawner
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, item):
+        try:
+            self.conn.send(item)
+        except OSError:
+            pass  # worker is gone; the monitor fails its batch and respawns it
+
+    def get(self):
+        return self.conn.recv()
+
+
+class _SpawnedProcess:
+    # Enough of the mp.Process interface for a worker forked by the spawner (not our child)
+    def __init__(self, pid):
+        self.pid = pid
+
+    def is_alive(self):
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def terminate(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+
+
+class _Request:
+    __slots__ = ("waveform", "generate_kwargs", "key", "future", "deadline")
+
+    def __init__(self, waveform, generate_kwargs, timeout):
+        self.waveform = waveform
+        self.generate_kwargs = generate_kwargs
+        # Only requests with identical generate() arguments can share a batch
+        self.key = repr(sorted(generate_kwargs.items()))
+        self.future = Future()
+        self.deadline = time.monotonic() + timeout
+
+
+class _Worker:
+    def __init__(self, idx):
+        self.idx = idx
+        self.process = None
+        self.generation = 0
+        self.task_queue = None
+        self.ready = False
+        self.busy_batch = None
+        self.last_heartbeat = 0.0
+        self.batches_done = 0
+        self.restarts = 0
+
+
+class ASRWorkerPool:
+    def __init__(self, num_workers=None, threads_per_worker=2, model_id=MODEL_ID,
+                 max_batch_size=8, batch_window_ms=30, max_queue=64,
+                 request_timeout=60.0, heartbeat_timeout=30.0, start_method="fork", share_model=False):
+        cpus = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.num_workers = num_workers or max(1, cpus // threads_per_worker)
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.batch_window = batch_window_ms / 1000.0
+        self.request_timeout = request_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.share_model = share_model and start_method == "fork"
+
+        self._ctx = mp.get_context(start_method)
+        # Respawns happen on the monitor thread, and forking a threaded process can copy held
+        # locks into the child. With fork, replacements come from a spawner process forked in
+        # start() instead (not a forkserver/spawn context: those re-import the entry script,
+        # i.e. all of app.py, in every replacement).
+        self._spawner = None
+        self._spawner_sock = None
+        self._spawner_lock = threading.Lock()
+        self._requests = queue.Queue(maxsize=max_queue)
+        self._result_queue = None
+        self._workers = [_Worker(i) for i in range(self.num_workers)]
+        self._idle = queue.Queue()
+        self._batches = {}
+        self._batch_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # --- lifecycle ---
+
+    def start(self):
+        self._result_queue = self._ctx.Queue()
+        if self.share_model and self.model_id not in _PRELOADED:
+            _PRELOADED[self.model_id] = load_hf_model(self.model_id)
+            # Keep the collector from touching (and so copying) every inherited object header
+            gc.collect()
+            gc.freeze()
+
+        # Fork all workers (and the spawner) before any pool thread exists in this process
+        for worker in self._workers:
+            self._spawn(worker)
+        if self._ctx.get_start_method() == "fork":
+            self._spawner_sock, child_sock = socket.socketpair()
+            self._spawner = self._ctx.Process(
+                target=_spawner_main, args=(child_sock, self._spawner_sock, self._result_queue, self.model_id, self.threads_per_worker),
+                daemon=True
+            )
+            self._spawner.start()
+            child_sock.close()
+
+        for target in (self._dispatch_loop, self._collect_loop, self._monitor_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"🧵 ASR pool started: {self.num_workers} workers x {self.threads_per_worker} threads")
+        return self
+
+    def shutdown(self, timeout=5.0):
+        self._stop.set()
+        for worker in self._workers:
+            if worker.process and worker.process.is_alive():
+                worker.task_queue.put(None)
+        for worker in self._workers:
+            if worker.process:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        if self._spawner_sock is not None:
+            self._spawner_sock.close()  # the spawner exits on EOF
+            self._spawner.join(timeout)
+        self._fail_pending(RuntimeError("ASR pool shut down"))
+
+    def _spawn(self, worker):
+        worker.generation += 1
+        worker.ready = False
+        worker.busy_batch = None
+        worker.last_heartbeat = time.monotonic()
+        if self._spawner is not None:
+            return self._respawn(worker)
+        worker.task_queue = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.idx, worker.generation, worker.task_queue, self._result_queue, self.model_id, self.threads_per_worker),
+            daemon=True
+        )
+        worker.process.start()
+
+    def _respawn(self, worker):
+        reader, writer = self._ctx.Pipe(duplex=False)
+        with self._spawner_lock:
+            socket.send_fds(self._spawner_sock, [struct.pack("ii", worker.idx, worker.generation)], [reader.fileno()])
+            pid = struct.unpack("i", self._spawner_sock.recv(4))[0]
+        reader.close()
+        worker.task_queue = _PipeQueue(writer)
+        worker.process = _SpawnedProcess(pid)
+
+    # --- public API ---
+
+    def submit(self, waveform, timeout=None, **generate_kwargs):
+        # Backpressure: refuse new work instead of queueing unboundedly
+        request = _Request(waveform, generate_kwargs, timeout or self.request_timeout)
+        try:
+            self._requests.put_nowait(request)
+        except queue.Full:
+            raise queue.Full("ASR queue is full, try again shortly")
+        return request.future
+
+    def transcribe(self, waveform, timeout=None, **generate_kwargs):
+        timeout = timeout or self.request_timeout
+        future = self.submit(waveform, timeout=timeout, **generate_kwargs)
+        return future.result(timeout=timeout)
+
+    def health(self):
+        now = time.monotonic()
+        return {
+            "queued": self._requests.qsize(),
+            "workers": [
+                {
+                    "idx": w.idx,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": bool(w.process and w.process.is_alive()),
+                    "ready": w.ready,
+                    "busy": w.busy_batch is not None,
+                    "seconds_since_heartbeat": round(now - w.last_heartbeat, 1),
+                    "batches_done": w.batches_done,
+                    "restarts": w.restarts,
+                }
+                for w in self._workers
+            ]
+        }
+
+    # --- background threads ---
+
+    def _next_batch(self, pending):
+        if pending:
+            first = pending.popleft()
+        else:
+            try:
+                first = self._requests.get(timeout=0.1)
+            except queue.Empty:
+                return []
+
+        batch = [first]
+        window_end = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                pending.append(request)
+        return batch
+
+    def _dispatch_loop(self):
+        pending = deque()
+        while not self._stop.is_set():
+            batch = self._next_batch(pending)
+            now = time.monotonic()
+            live = []
+            for request in batch:
+                if request.future.set_running_or_notify_cancel() is False:
+                    continue
+                if now > request.deadline:
+                    request.future.set_exception(TimeoutError("ASR request expired in queue"))
+                else:
+                    live.append(request)
+            if not live:
+                continue
+
+            worker = self._take_idle_worker()
+            batch_id = next(self._batch_ids)
+            with self._lock:
+                self._batches[batch_id] = live
+                worker.busy_batch = batch_id
+            worker.task_queue.put((batch_id, [r.waveform for r in live], live[0].generate_kwargs))
+
+    def _take_idle_worker(self):
+        while True:
+            worker, gen = self._idle.get()
+            # Entries queued before a restart belong to a process that no longer exists
+            if gen == worker.generation and worker.ready and worker.process.is_alive():
+                return worker
+
+    def _collect_loop(self):
+        while not self._stop.is_set():
+            try:
+                kind, idx, gen, batch_id, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            worker = self._workers[idx]
+            if gen != worker.generation:
+                continue  # late message from a replaced process
+            worker.last_heartbeat = time.monotonic()
+
+            if kind == "ready":
+                worker.ready = True
+                self._idle.put((worker, gen))
+            elif kind in ("result", "error"):
+                with self._lock:
+                    requests = self._batches.pop(batch_id, [])
+                    worker.busy_batch = None
+                    worker.batches_done += 1
+                for i, request in enumerate(requests):
+                    if kind == "result":
+                        request.future.set_result(payload[i])
+                    else:
+                        request.future.set_exception(RuntimeError(f"ASR worker {idx} failed: {payload}"))
+                self._idle.put((worker, gen))
+
+    def _monitor_loop(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            now = time.monotonic()
+            for worker in self._workers:
+                dead = not worker.process.is_alive()
+                hung = worker.ready and now - worker.last_heartbeat > self.heartbeat_timeout
+                if not (dead or hung):
+                    continue
+
+                print(f"❗ ASR worker {worker.idx} {'died' if dead else 'stopped responding'}, restarting")
+                if not dead:
+                    worker.process.terminate()
+                    worker.process.join(1.0)
+                with self._lock:
+                    requests = self._batches.pop(worker.busy_batch, []) if worker.busy_batch is not None else []
+                for request in requests:
+                    request.future.set_exception(RuntimeError(f"ASR worker {worker.idx} crashed"))
+                worker.restarts += 1
+                self._spawn(worker)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for requests in batches:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(error)
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(error)
@@ -0,0 +1,120 @@
+# audio_frontend.py
+# Cleans up VHF radio audio once and keeps the result (waveform + Whisper log-mel features)
+# so VAD, ASR and any later re-decode of the same clip reuse it.
+import os
+import threading
+from functools import lru_cache
+from collections import OrderedDict, namedtuple
+import numpy as np
+from scipy import signal
+
+from transcript_cache import audio_fingerprint
+
+SAMPLE_RATE = 16000
+
+# ATC_FRONTEND=1 enables band-pass + AGC, ATC_DENOISE=1 adds spectral noise reduction
+FRONTEND_OPTIONS = {
+    "enabled": os.getenv("ATC_FRONTEND", "0") == "1",
+    "denoise": os.getenv("ATC_DENOISE", "0") == "1",
+}
+
+# Cleaned 16 kHz waveform (for VAD) and Whisper log-mel features (n_mels, 3000) for ASR
+FrontEndResult = namedtuple("FrontEndResult", ["audio", "input_features"])
+
+
+@lru_cache(maxsize=16)
+def _bandpass_sos(sample_rate, low_hz, high_hz, order):
+    return signal.butter(order, [low_hz, high_hz], btype="bandpass", fs=sample_rate, output="sos")
+
+
+def bandpass(audio, sample_rate=SAMPLE_RATE, low_hz=300.0, high_hz=3400.0, order=4):
+    # VHF AM voice channel is ~300-3400 Hz, everything outside is hum, hiss or squelch tail
+    if len(audio) < 3 * (2 * order + 1):
+        return audio
+    sos = _bandpass_sos(sample_rate, low_hz, min(high_hz, sample_rate / 2 - 1), order)
+    return signal.sosfiltfilt(sos, audio).astype(np.float32)
+
+
+def agc(audio, sample_rate=SAMPLE_RATE, target_rms=0.1, window_ms=50, max_gain=20.0, smoothing=5):
+    # Per-window RMS -> gain, smoothed and interpolated back to sample resolution
+    window = max(1, int(sample_rate * window_ms / 1000))
+    n_windows = int(np.ceil(len(audio) / window))
+    if n_windows == 0:
+        return audio
+
+    padded = np.zeros(n_windows * window, dtype=np.float32)
+    padded[:len(audio)] = audio
+    rms = np.sqrt(np.mean(padded.reshape(n_windows, window) ** 2, axis=1)) + 1e-6
+    gain = np.minimum(target_rms / rms, max_gain)
+    if smoothing > 1 and n_windows > smoothing:
+        gain = np.convolve(gain, np.ones(smoothing) / smoothing, mode="same")
+
+    centers = (np.arange(n_windows) + 0.5) * window
+    gain = np.interp(np.arange(len(audio)), centers, gain)
+    return np.clip(audio * gain, -1.0, 1.0).astype(np.float32)
+
+
+def spectral_denoise(audio, sample_rate=SAMPLE_RATE, n_fft=512, hop=128, noise_percentile=10, strength=1.5, floor=0.05):
+    # Spectral subtraction: the noise profile is the quietest frames of the clip itself,
+    # which on a radio channel is the carrier hiss between words
+    if len(audio) < n_fft:
+        return audio
+    _, _, spec = signal.stft(audio, fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop)
+    magnitude = np.abs(spec)
+    frame_energy = magnitude.sum(axis=0)
+    quiet = frame_energy <= np.percentile(frame_energy, noise_percentile)
+    noise = magnitude[:, quiet].mean(axis=1, keepdims=True)
+
+    cleaned = np.maximum(magnitude - strength * noise, floor * magnitude)
+    _, restored = signal.istft(cleaned * np.exp(1j * np.angle(spec)), fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop)
+    return restored[:len(audio)].astype(np.float32)
+
+
+def clean_audio(audio, sample_rate=SAMPLE_RATE, denoise=False):
+    audio = np.asarray(audio, dtype=np.float32)
+    audio = bandpass(audio, sample_rate)
+    if denoise:
+        audio = spectral_denoise(audio, sample_rate)
+    return agc(audio, sample_rate)
+
+
+class AudioFrontEnd:
+    def __init__(self, feature_extractor, denoise=False, max_entries=64):
+        self.feature_extractor = feature_extractor
+        self.denoise = denoise
+        self.max_entries = max_entries
+        self.params = {"frontend": "bp300-3400+agc", "denoise": denoise}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def process(self, waveform, sample_rate=SAMPLE_RATE, features=True, cache=True):
+        # features=False: cleaned audio only (input_features is None), for callers that hand the
+        # audio to the ASR pool, whose workers compute their own features.
+        # cache=False: one-off clips (long-form segments) that would only evict reusable entries.
+        key = audio_fingerprint(waveform, "frontend", self.params) if cache else None
+        if cache:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return cached
+                self.stats["misses"] += 1
+
+        audio = clean_audio(waveform, sample_rate, self.denoise)
+        if not features:
+            return FrontEndResult(audio, None)
+        input_features = self.feature_extractor(audio, sampling_rate=sample_rate, return_tensors="np").input_features[0]
+        result = FrontEndResult(audio, input_features)
+
+        if cache:
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return result
+
+    def process_batch(self, waveforms, sample_rate=SAMPLE_RATE, features=True, cache=True):
+        results = [self.process(w, sample_rate, features, cache) for w in waveforms]
+        return results, np.stack([r.input_features for r in results]) if features else None
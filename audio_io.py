@@ -0,0 +1,106 @@
+# audio_io.py
+import os
+import struct
+import numpy as np
+import soundfile as sf
+import soxr
+
+TARGET_SR = 16000
+
+# Formats libsndfile decodes natively; everything else (mp3, webm, ...) goes through librosa
+FAST_FORMATS = {"WAV", "FLAC", "OGG", "AIFF"}
+
+# WAV uploads above this size are memory-mapped instead of read into a buffer
+MMAP_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+PCM_DTYPES = {
+    "PCM_16": ("<i2", 1 / 32768.0),
+    "PCM_32": ("<i4", 1 / 2147483648.0),
+    "FLOAT": ("<f4", None),
+}
+
+
+def to_float32(audio):
+    # Integer PCM (e.g. Gradio microphone chunks) is scaled to [-1, 1]
+    if audio.dtype == np.float32:
+        return audio
+    if np.issubdtype(audio.dtype, np.integer):
+        scale = 1.0 / np.iinfo(audio.dtype).max
+        out = audio.astype(np.float32)
+        out *= scale
+        return out
+    return audio.astype(np.float32)
+
+
+def to_mono(audio):
+    if audio.ndim == 1:
+        return audio
+    if audio.shape[1] == 1:
+        return audio[:, 0]  # view, no copy
+    return audio.mean(axis=1, dtype=np.float32)
+
+
+def resample(audio, orig_sr, target_sr=TARGET_SR, quality="MQ"):
+    if orig_sr == target_sr:
+        return audio
+    return soxr.resample(audio, orig_sr, target_sr, quality=quality)
+
+
+def _wav_data_chunk(path):
+    # Walk the RIFF chunks to find where the PCM samples start
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"data":
+                return f.tell(), size
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def _memmap_wav(path, info):
+    if info.subtype not in PCM_DTYPES:
+        return None
+    chunk = _wav_data_chunk(path)
+    if chunk is None:
+        return None
+
+    offset, size = chunk
+    dtype, scale = PCM_DTYPES[info.subtype]
+    frame_bytes = np.dtype(dtype).itemsize * info.channels
+    frames = min(size, os.path.getsize(path) - offset) // frame_bytes
+
+    data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames, info.channels))
+    if info.channels == 1:
+        audio = data[:, 0].astype(np.float32)
+    else:
+        audio = data.mean(axis=1, dtype=np.float32)
+    if scale is not None:
+        audio *= scale
+    return audio
+
+
+def load_audio(audio_path, target_sr=TARGET_SR):
+    try:
+        info = sf.info(audio_path)
+    except RuntimeError:
+        info = None
+
+    if info is None or info.format not in FAST_FORMATS:
+        import librosa
+        waveform, sr = librosa.load(audio_path, sr=target_sr)
+        return waveform, sr
+
+    audio = None
+    if info.format == "WAV" and os.path.getsize(audio_path) >= MMAP_THRESHOLD_BYTES:
+        audio = _memmap_wav(audio_path, info)
+    if audio is None:
+        audio, _ = sf.read(audio_path, dtype="float32", always_2d=True)
+        audio = to_mono(audio)
+
+    audio = resample(audio, info.samplerate, target_sr)
+    return np.ascontiguousarray(audio, dtype=np.float32), target_sr
@@ -0,0 +1,117 @@
+# benchmark_asr.py
+# Compares CPU inference settings for the HF Whisper model on one or more clips:
+#   python benchmark_asr.py clip1.wav clip2.wav --runs 5 --threads 4
+#   python benchmark_asr.py clips/*.wav --speculative   (draft acceptance rate vs plain decoding)
+import time
+import argparse
+import statistics
+import torch
+
+from asr_models import MODEL_ID, load_hf_model, transcribe_batch
+from audio_io import load_audio
+from speculative_decoding import DRAFT_MODEL_ID, SpeculativeTranscriber, load_draft_model
+
+
+def configurations(threads):
+    return [
+        ("fp32 default", {}),
+        (f"fp32 {threads} threads", {"num_threads": threads}),
+        (f"int8 {threads} threads", {"num_threads": threads, "quantize": True}),
+        (f"int8 {threads} threads + compile", {"num_threads": threads, "quantize": True, "compile_model": True}),
+    ]
+
+
+def benchmark(name, options, waveforms, runs, model_id):
+    default_threads = torch.get_num_threads()
+    start = time.time()
+    processor, model = load_hf_model(model_id, cpu_options={**options, "warmup": True})
+    load_time = time.time() - start
+
+    latencies = []
+    texts = []
+    for _ in range(runs):
+        for waveform in waveforms:
+            t0 = time.perf_counter()
+            texts.append(transcribe_batch(processor, model, [waveform])[0])
+            latencies.append(time.perf_counter() - t0)
+
+    torch.set_num_threads(default_threads)
+    latencies.sort()
+    return {
+        "name": name,
+        "load_s": load_time,
+        "mean_s": statistics.mean(latencies),
+        "p50_s": latencies[len(latencies) // 2],
+        "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "texts": texts[:len(waveforms)],
+    }
+
+
+def benchmark_speculative(waveforms, runs, model_id, draft_model_id, draft_tokens):
+    processor, model = load_hf_model(model_id)
+    draft_processor, draft_model = load_draft_model(draft_model_id)
+    spec = SpeculativeTranscriber(processor, model, draft_processor, draft_model, num_assistant_tokens=draft_tokens)
+    spec_failures = []
+
+    plain, assisted, same = [], [], 0
+    for _ in range(runs):
+        for waveform in waveforms:
+            t0 = time.perf_counter()
+            reference = transcribe_batch(processor, model, [waveform])[0]
+            plain.append(time.perf_counter() - t0)
+
+            spec.enabled = True  # measure every clip, never switch to plain decoding mid-run
+            fallbacks = spec.stats["fallbacks"]
+            t0 = time.perf_counter()
+            text = spec.transcribe(waveform)
+            assisted.append(time.perf_counter() - t0)
+            if spec.stats["fallbacks"] > fallbacks:
+                spec_failures.append(len(assisted) - 1)
+            same += text.strip() == reference.strip()
+
+    stats = spec.stats
+    print(f"\nDraft model: {draft_model_id} ({'same' if spec.same_tokenizer else 'different'} tokenizer, "
+          f"{draft_tokens} draft tokens per round)")
+    print(f"Clips: {len(plain)}  assisted: {stats['assisted']}  fell back: {len(spec_failures)}")
+    print(f"Drafted tokens: {stats['drafted']}  accepted: {stats['accepted']}  "
+          f"acceptance rate: {spec.acceptance_rate():.1%}")
+    if stats["assisted"]:
+        print(f"Tokens per verification round: {(stats['accepted'] + stats['rounds']) / max(1, stats['rounds']):.2f}")
+    print(f"Plain mean: {statistics.mean(plain):.3f}s  speculative mean: {statistics.mean(assisted):.3f}s  "
+          f"speedup: {statistics.mean(plain) / statistics.mean(assisted):.2f}x")
+    print(f"Identical transcripts: {same}/{len(plain)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper CPU inference modes")
+    parser.add_argument("audio", nargs="+")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--model-id", default=MODEL_ID)
+    parser.add_argument("--skip-compile", action="store_true")
+    parser.add_argument("--speculative", action="store_true", help="measure draft-model acceptance instead")
+    parser.add_argument("--draft-model-id", default=DRAFT_MODEL_ID)
+    parser.add_argument("--draft-tokens", type=int, default=5)
+    args = parser.parse_args()
+
+    waveforms = [load_audio(path)[0] for path in args.audio]
+    if args.speculative:
+        return benchmark_speculative(waveforms, args.runs, args.model_id, args.draft_model_id, args.draft_tokens)
+
+    results = []
+    for name, options in configurations(args.threads):
+        if args.skip_compile and options.get("compile_model"):
+            continue
+        print(f"Running {name} ...")
+        results.append(benchmark(name, options, waveforms, args.runs, args.model_id))
+
+    baseline = results[0]
+    print(f"\n{'mode':<32}{'load s':>8}{'mean s':>9}{'p50 s':>8}{'p95 s':>8}{'speedup':>9}  same text")
+    for r in results:
+        same = sum(a.strip() == b.strip() for a, b in zip(r["texts"], baseline["texts"]))
+        print(f"{r['name']:<32}{r['load_s']:>8.1f}{r['mean_s']:>9.3f}{r['p50_s']:>8.3f}{r['p95_s']:>8.3f}"
+              f"{baseline['mean_s'] / r['mean_s']:>8.2f}x  {same}/{len(waveforms)}")
+
+
+if __name__ == "__main__":
+    main()
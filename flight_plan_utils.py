@@ -1,35 +1,43 @@
 from collections import defaultdict
-import inspect
-from icao_rules_de import ICAO_RULES_DE, PHASE_MAPPING, PHASE_ORDER
+from icao_rules_de import PHASE_ORDER
+from rule_packs import get_pack
 from collections import OrderedDict
 from shapely.geometry import Point
 import geopandas as gpd
 import json
+import frequency_retrieval
 from frequency_retrieval import (get_airport_by_icao, get_frequencies, get_lat_lon, generate_route_points,plot_route_over_fis, get_ordered_frequencies, create_nested_frequency_map, extract_frequency_roles)
 import api_frequencies
+from route_precompute import lookup_route
+from airspace_index import get_airspace_index
+from prompt_biasing import register_flight
+import openaip_sync
+from position_reports import arrival_report, format_position_report, get_airfield_index
 
-# Load geojson for airport and airspace data
-with open("openaip_data/de_apt.geojson", "r") as file:
-    airport_data = json.load(file)
+# Airport and airspace data are parsed once and shared with frequency_retrieval / airspace_index.
+# openaip_sync swaps in new indexes when the snapshots change, so look them up per request.
+get_airspace_index()
 
-airspaces = gpd.read_file("openaip_data/de_asp.geojson")
-airspaces = airspaces[airspaces.geometry.type == "Polygon"].set_geometry("geometry").to_crs(epsg=4326)
-
-def build_checklist_from_rules(user_data):
+def build_checklist_from_rules(user_data, language="de", airport=None):
     checklist = defaultdict(list)
+    pack = get_pack(language, airport)
+
+    # Position reports are phrased in the pack's language
+    ctx = dict(user_data.get("ctx") or {})
+    if user_data.get("arrival_report") is not None:
+        ctx.setdefault("arrival_position", format_position_report(user_data["arrival_report"], language))
 
-    for key, rule in ICAO_RULES_DE.items():
-        phase = PHASE_MAPPING.get(key)
-        if not phase:
+    for key in pack.intents:
+        rule = pack.rules[key]
+        if not rule.phase:
             continue  # skip if not assigned to a phase
 
-        try:
-            sig = inspect.signature(rule["response"])
-            kwargs = {k: v for k, v in user_data.items() if k in sig.parameters}
-            call = rule["response"](**kwargs)
-            checklist[phase].append(call)
-        except Exception as e:
-            print(f"Could not format {key}: {e}")
+        # Required slots are known per template, no need to call and catch
+        missing = rule.template.missing(user_data)
+        if missing:
+            print(f"Could not format {key}: missing {', '.join(missing)}")
+            continue
+        checklist[rule.phase].append(rule.template.format(user_data, ctx))
 
     return checklist
 
@@ -55,10 +63,10 @@ def inject_frequency_transitions(checklist, nested_freqs):
 
     return enhanced
 
-def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao, position):
-    # Get airport features
-    dep_airport = api_frequencies.get_airport_info(dep_icao)
-    arr_airport = api_frequencies.get_airport_info(arr_icao)
+def compute_route_frequencies(dep_icao, arr_icao, cruise_altitude=None):
+    # Get airport features from the synced snapshot, the API only for airports it doesn't know
+    dep_airport = get_airport_by_icao(dep_icao, frequency_retrieval.airport) or api_frequencies.get_airport_info(dep_icao)
+    arr_airport = get_airport_by_icao(arr_icao, frequency_retrieval.airport) or api_frequencies.get_airport_info(arr_icao)
 
     if not dep_airport or not arr_airport:
         return "Error: Could not retrieve one or both airport features."
@@ -66,9 +74,9 @@ def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao,
     dep_coords = dep_airport["geometry"]["coordinates"]
     arr_coords = arr_airport["geometry"]["coordinates"]
 
-    # Extract frequencies
-    dep_freqs = api_frequencies.get_freqs_from_api(dep_icao)
-    arr_freqs = api_frequencies.get_freqs_from_api(arr_icao)
+    # Extract frequencies (API items carry them top-level, snapshot features in properties)
+    dep_freqs = get_frequencies(dep_airport if "properties" in dep_airport else {"properties": dep_airport})
+    arr_freqs = get_frequencies(arr_airport if "properties" in arr_airport else {"properties": arr_airport})
 
     # Generate route and enroute frequencies
     start = Point(dep_coords[0], dep_coords[1])
@@ -78,7 +86,13 @@ def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao,
     print(f"Arrival Frequencies: {arr_freqs}")
     
     route_points = generate_route_points(start, end)
-    enroute_freqs = get_ordered_frequencies(route_points, airspaces)
+    airspace_index = get_airspace_index()
+    airspaces = airspace_index.airspaces
+    if cruise_altitude:
+        # Only FIS/controlled airspace whose vertical limits contain the cruise altitude
+        enroute_freqs = airspace_index.frequencies_along(route_points, cruise_altitude)
+    else:
+        enroute_freqs = get_ordered_frequencies(route_points, airspaces)
     
     print("Nested Frequency List:")
     for (name, value), info in enroute_freqs.items():
@@ -91,6 +105,23 @@ def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao,
     nested_freqs = create_nested_frequency_map(dep_freqs, arr_freqs, enroute_freqs)
     print(f"Nested Frequencies: {nested_freqs}")
 
+    return dep_freqs, arr_freqs, enroute_freqs, nested_freqs
+
+def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao, position, cruise_altitude=None):
+    openaip_sync.refresh()
+
+    # Precomputed routes (route_precompute.py) turn the whole frequency lookup into one read.
+    # They are altitude-agnostic, so a planned altitude always takes the live path.
+    precomputed = None if cruise_altitude else lookup_route(dep_icao, arr_icao)
+    if precomputed:
+        dep_freqs, arr_freqs, enroute_freqs, nested_freqs = precomputed
+        print(f"Using precomputed frequencies for {dep_icao.upper()}-{arr_icao.upper()}")
+    else:
+        result = compute_route_frequencies(dep_icao, arr_icao, cruise_altitude)
+        if isinstance(result, str):
+            return result
+        dep_freqs, arr_freqs, enroute_freqs, nested_freqs = result
+
     # Retrieve frequency names for radio roles
     roles = extract_frequency_roles(dep_freqs, arr_freqs, enroute_freqs)
     print(f"Roles: {roles}")
@@ -109,8 +140,17 @@ def generate_checklist_from_form(cs, airplane_type, num_pax, dep_icao, arr_icao,
         "arr_info": roles.get("arr_info", ("", "")),
     }
 
+    # Arrival report from the inbound track instead of a fixed "5 miles south"
+    airfields = get_airfield_index()
+    dep_coords, arr_coords = airfields.coords(dep_icao), airfields.coords(arr_icao)
+    if dep_coords and arr_coords:
+        user_data["arrival_report"] = arrival_report(arr_coords, dep_coords, cruise_altitude)
+
+    # Bias the ASR towards this flight's callsign, airports and stations
+    register_flight(cs, airplane_type, dep_icao, arr_icao, position, nested_freqs.keys())
+
     # Build and enhance checklist
-    base = build_checklist_from_rules(user_data)
+    base = build_checklist_from_rules(user_data, airport=dep_icao)
     with_transitions = inject_frequency_transitions(base, nested_freqs)
 
     # Format for display
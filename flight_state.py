@@ -0,0 +1,73 @@
+# flight_state.py
+import threading
+from icao_rules_en import PHASE_ORDER
+from rule_packs import get_pack
+
+
+class FlightStateMachine:
+    def __init__(self, language="en", phase=None, airport=None):
+        self.language = language if language in ("en", "de") else "en"
+        self.airport = airport
+        self.phase_index = PHASE_ORDER.index(phase) if phase in PHASE_ORDER else 0
+        self._lock = threading.Lock()
+
+    @property
+    def pack(self):
+        # Looked up per call so rule pack reloads apply to running sessions
+        return get_pack(self.language, self.airport)
+
+    @property
+    def phase(self):
+        return PHASE_ORDER[self.phase_index]
+
+    def reachable_phases(self):
+        # The current phase and the next one; earlier phases are done
+        return PHASE_ORDER[self.phase_index:self.phase_index + 2]
+
+    def _advance(self, intent, pack):
+        phase = pack.phase_of.get(intent)
+        if phase in PHASE_ORDER:
+            self.phase_index = max(self.phase_index, PHASE_ORDER.index(phase))
+
+    def match(self, transcript):
+        text = transcript.lower()
+        pack = self.pack
+
+        with self._lock:
+            for phase in self.reachable_phases():
+                for intent, rx in pack.by_phase.get(phase, ()):
+                    if rx.search(text):
+                        self._advance(intent, pack)
+                        return intent
+
+            # Nothing reachable matched: fall back to the full rule set in declaration order.
+            # A fallback match is answered but never moves the phase, so one misheard
+            # transmission can't skip the flight ahead and lock out the phases in between.
+            for intent, rx in pack.all:
+                if rx.search(text):
+                    return intent
+        return None
+
+    def reset(self):
+        with self._lock:
+            self.phase_index = 0
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_flight_session(session_id, language="en"):
+    key = (session_id.replace("-", "").upper(), language)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = FlightStateMachine(language)
+        return _sessions[key]
+
+
+def reset_flight_session(session_id, language=None):
+    # language=None drops the session in every language
+    callsign = session_id.replace("-", "").upper()
+    with _sessions_lock:
+        for key in [k for k in _sessions if k[0] == callsign and language in (None, k[1])]:
+            del _sessions[key]
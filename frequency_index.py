@@ -0,0 +1,137 @@
+# frequency_index.py
+# Reverse index from a heard frequency to the station(s) using it, over every airport and
+# airspace frequency in the OpenAIP snapshots. Sorted kHz keys, bisect lookups.
+import bisect
+import threading
+from collections import namedtuple
+
+from frequency_retrieval import airport
+from airspace_index import get_airspace_index
+import openaip_sync
+
+# Only used when nothing sits on the heard channel exactly: 8.33 kHz channel names sit up
+# to 5 kHz from the carrier, and a clipped readback ("123.45") lands inside the same window.
+# Neighbouring 8.33 channels are 5 kHz apart too, so the window never overrides an exact hit.
+TOLERANCE_KHZ = 5
+
+# Station names that only make sense with the airfield in front
+GENERIC_NAMES = {"ATIS", "APRON", "TOWER", "GROUND", "RADIO", "INFO", "VORFELD", "SEGELFLUG START", "SEGELFLUG"}
+
+# Words every station name shares; they say nothing about which station was meant
+SERVICE_WORDS = {"information", "radio", "tower", "radar", "info", "atis", "apron", "ground", "vorfeld", "turm"}
+
+# OpenAIP frequency type 20 is pilot-controlled lighting; some lighting entries carry
+# another type, so their names are checked too
+NON_ATC_TYPES = {20}
+NON_ATC_WORDS = ("LIGHT", "PERC", "PTT")
+
+# source: airport or airspace the frequency was listed under
+Station = namedtuple("Station", ["name", "frequency", "khz", "source"])
+
+
+def to_khz(value):
+    try:
+        return int(round(float(str(value).replace(",", ".").replace("MHz", "").strip()) * 1000))
+    except ValueError:
+        return None
+
+
+def station_name(name, owner):
+    name = name.strip()
+    if name.upper().startswith("(FIS) "):
+        name = name[6:]
+    if name.upper() in GENERIC_NAMES and owner:
+        name = f"{owner} {name}"
+    return name.title()
+
+
+def is_atc(freq):
+    name = (freq.get("name") or "").upper()
+    return freq.get("type") not in NON_ATC_TYPES and not any(w in name for w in NON_ATC_WORDS)
+
+
+def _entries():
+    for feature in airport["features"]:
+        props = feature.get("properties", {})
+        owner = props.get("name", "").strip()
+        for freq in props.get("frequencies", []) or []:
+            if is_atc(freq):
+                yield freq.get("name") or "", freq.get("value"), owner, props.get("icaoCode") or props.get("name")
+
+    index = get_airspace_index()
+    names = index.airspaces["name"] if "name" in index.airspaces else [None] * len(index.frequencies)
+    for airspace, freqs in zip(names, index.frequencies):
+        for freq in freqs:
+            if is_atc(freq):
+                yield freq.get("name") or "", freq.get("value"), None, airspace
+
+
+class FrequencyIndex:
+    def __init__(self, entries):
+        stations = {}
+        for name, value, owner, source in entries:
+            khz = to_khz(value) if value else None
+            if khz is None or not name.strip() or name.strip().upper() == "UNKNOWN":
+                continue
+            station = Station(station_name(name, owner), value.strip(), khz, source)
+            stations.setdefault((khz, station.name), station)
+        self.stations = sorted(stations.values(), key=lambda s: (s.khz, s.name))
+        self.keys = [s.khz for s in self.stations]
+
+    def lookup(self, frequency, tolerance_khz=TOLERANCE_KHZ):
+        # Stations within the tolerance window, closest first
+        khz = to_khz(frequency)
+        if khz is None:
+            return []
+        lo = bisect.bisect_left(self.keys, khz - tolerance_khz)
+        hi = bisect.bisect_right(self.keys, khz + tolerance_khz)
+        return sorted(self.stations[lo:hi], key=lambda s: abs(s.khz - khz))
+
+    def resolve(self, frequency, transcript=""):
+        # Best station for a heard frequency: the exact channel if anything is on it, the
+        # tolerance window otherwise. Shared frequencies are told apart by the station name
+        # in the same transmission ("contact Langen Information on ...").
+        candidates = self.lookup(frequency, 0) or self.lookup(frequency)
+        if not candidates:
+            return None
+        khz = to_khz(frequency)
+        words = set(transcript.lower().split()) - SERVICE_WORDS
+
+        def rank(station):
+            # Closest channel first; a place name heard in the instruction only breaks ties
+            heard = sum(w in words for w in station.name.lower().split())
+            return abs(station.khz - khz), -heard, "INFORMATION" not in station.name.upper()
+
+        return min(candidates, key=rank)
+
+
+def format_station(station, frequency=None):
+    # The readback repeats the frequency as heard, not the listed one it was matched to
+    return f"{station.name} {frequency or station.frequency}"
+
+
+_index = {"current": None}
+_lock = threading.Lock()
+
+
+def get_frequency_index():
+    with _lock:
+        if _index["current"] is None:
+            _index["current"] = FrequencyIndex(_entries())
+        return _index["current"]
+
+
+def resolve_station(frequency, transcript=""):
+    # Readback text for a frequency instruction; the bare frequency when no station matches
+    station = get_frequency_index().resolve(frequency, transcript)
+    return format_station(station, frequency) if station is not None else str(frequency)
+
+
+def _on_sync(dataset, changes, features):
+    # A few thousand entries: rebuilding the whole index takes milliseconds
+    index = FrequencyIndex(_entries())
+    with _lock:
+        _index["current"] = index
+
+
+openaip_sync.on_sync(_on_sync)
@@ -1,4 +1,5 @@
 import json
+import numpy as np
 from geopy.point import Point
 from shapely.geometry import Point as ShapelyPoint
 import geopandas as gpd
@@ -6,10 +7,26 @@ from collections import OrderedDict, defaultdict
 import matplotlib.pyplot as plt
 
 
-with open("openaip_data/de_apt.geojson", "r") as file:
+AIRPORT_FILE = "openaip_data/de_apt.geojson"
+
+with open(AIRPORT_FILE, "r") as file:
     airport = json.load(file)
 
+def build_airport_index(features):
+    # ICAO -> feature, first occurrence wins like the linear scan below
+    index = {}
+    for feature in features:
+        icao = feature.get("properties", {}).get("icaoCode")
+        if icao:
+            index.setdefault(icao.upper(), feature)
+    return index
+
+# Replaced as a whole by openaip_sync when the snapshot changes, never mutated in place
+airport_index = build_airport_index(airport["features"])
+
 def get_airport_by_icao(icao_code, geojson):
+    if geojson is airport:
+        return airport_index.get(icao_code.upper())
     for feature in geojson["features"]:
         props = feature.get("properties", {})
         if props.get("icaoCode") == icao_code.upper():
@@ -75,32 +92,47 @@ def plot_route_over_fis(route_points, fis_airspaces, dep_icao="DEP", arr_icao="A
 
 # Ensure enroute frequencies are ordered and unique
 def get_ordered_frequencies(route_points, fis_airspaces):
-    freq_dict = OrderedDict()
-
-    for point in route_points:
-        buffered = point.buffer(0.01)
-        matches = fis_airspaces[fis_airspaces.geometry.intersects(buffered)]
-
-        for _, row in matches.iterrows():
-            freqs_raw = row.get("frequencies", [])
-            freqs = safe_parse_frequencies(freqs_raw)
-
-            for freq_obj in freqs:
-                name = freq_obj.get("name", "").strip()
-                value = freq_obj.get("value", "").strip()
-
-                # Skip if name or value is missing or name is UNKNOWN
-                if not name or not value or name.upper() == "UNKNOWN":
-                    continue
-
-                key = (name, value)
-                if key not in freq_dict:
-                    freq_dict[key] = {
-                        "name": name,
-                        "frequency": f"{value} MHz",
-                        "phase": "Enroute / Cruise"  # Default phase label
-                    }
-    return freq_dict
+    return get_ordered_frequencies_by_leg(route_points, [0] * len(route_points), fis_airspaces)[0]
+
+# Same as above for a whole multi-leg polyline: leg_ids[i] is the leg of route_points[i]
+def get_ordered_frequencies_by_leg(route_points, leg_ids, fis_airspaces):
+    num_legs = max(leg_ids) + 1 if leg_ids else 1
+    legs = [OrderedDict() for _ in range(num_legs)]
+    if not route_points or fis_airspaces.empty:
+        return legs
+
+    # One bulk query against the spatial index instead of a full scan per point
+    buffered = [point.buffer(0.01) for point in route_points]
+    point_idx, poly_idx = fis_airspaces.sindex.query(buffered, predicate="intersects")
+    order = np.lexsort((poly_idx, point_idx))  # route order, then table order
+
+    seen = set()
+    for p, i in zip(point_idx[order], poly_idx[order]):
+        leg = leg_ids[p]
+        if (leg, i) in seen:
+            continue
+        seen.add((leg, i))
+
+        freqs_raw = fis_airspaces.iloc[i].get("frequencies", [])
+        freqs = safe_parse_frequencies(freqs_raw)
+        freq_dict = legs[leg]
+
+        for freq_obj in freqs:
+            name = freq_obj.get("name", "").strip()
+            value = freq_obj.get("value", "").strip()
+
+            # Skip if name or value is missing or name is UNKNOWN
+            if not name or not value or name.upper() == "UNKNOWN":
+                continue
+
+            key = (name, value)
+            if key not in freq_dict:
+                freq_dict[key] = {
+                    "name": name,
+                    "frequency": f"{value} MHz",
+                    "phase": "Enroute / Cruise"  # Default phase label
+                }
+    return legs
 
 '''
 def get_intersected_frequencies(route_points, fis_airspaces):
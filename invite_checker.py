@@ -0,0 +1,133 @@
+# invite_checker.py
+# Streaming completeness check for German initial calls: detects the call type from
+# INVITE_RULES_DE and reports which required_keys are still missing after each partial transcript.
+import re
+import threading
+from collections import namedtuple
+
+from invite_rules_de import INVITE_RULES_DE
+from slot_extraction import normalize_numbers
+from transcription_utils import ICAO_TO_LETTER
+
+InviteStatus = namedtuple("InviteStatus", ["intent", "required", "present", "missing", "complete"])
+
+_PHONETIC = "|".join(re.escape(w) for w in ICAO_TO_LETTER)
+
+# One compiled detector per required key, run on lower-cased, digit-normalized text.
+# A bare five-letter d-word is too common in German ("danke", "diese"), so a registration
+# only counts with its hyphen, spelled out phonetically, or in capitals (CASED_KEY_PATTERNS).
+KEY_PATTERNS = {
+    "rufzeichen": rf"\bd-[a-z]{{4}}\b|\b(?:{_PHONETIC})(?:[\s,-]+(?:{_PHONETIC})){{2,}}\b",
+    "typ": r"\b(?:cessna|piper|robin|katana|diamond|cirrus|mooney|beechcraft|socata|ultraleicht|motorsegler"
+           r"|segelflugzeug|c\s?\d{3}|pa\s?\d{2}|da\s?\d{2}|dr\s?\d{3}|sr\s?\d{2}|typ)\b",
+    "personen": r"\b\d+\s+(?:personen|person|leute|pob|mann)\b|\bpersonen an bord\b|\balleine?\b|\ballein an bord\b",
+    "ziel": r"\b(?:nach|ziel|richtung|zielflugplatz|to)\s+\w+",
+    "position": r"\b(?:position|vorfeld|abstellfläche|abstellplatz|halle|hangar|tankstelle|rollhalt|querab"
+                r"|nördlich|südlich|östlich|westlich|über|meilen|nm)\b",
+    "höhe": r"\b\d{3,5}\s*(?:fuß|fuss|ft|feet)\b|\bflugfläche\s*\d+|\bfl\s?\d{2,3}\b|\bhöhe\b",
+    "transponder": r"\b(?:transponder|squawk|code)\b",
+    "bitte": r"\bbitte\b|\berbitte\b",
+    "piste": r"\b(?:piste|runway)\s+\d{1,2}\b",
+    "runway": r"\b(?:piste|runway)\s+\d{1,2}\b",
+    "abflugbereit": r"\babflugbereit\b|\bready for departure\b",
+    "rollhalt": r"\b(?:rollhalt|haltepunkt|holding point)\b",
+}
+
+# Run on the transcript as written
+CASED_KEY_PATTERNS = {
+    "rufzeichen": r"\bD[A-Z]{4}\b",
+}
+
+
+class CompiledInviteRules:
+    def __init__(self, rules):
+        # Rule order matters: like detect_invite_intent, the first rule that matches wins
+        self.intents = list(rules)
+        self.required = {intent: tuple(rule.get("required_keys", [])) for intent, rule in rules.items()}
+        self.intent_res = [re.compile("|".join(re.escape(p.lower()) for p in rule["patterns"])) for rule in rules.values()]
+        keys = {k for required in self.required.values() for k in required}
+        unknown = keys - set(KEY_PATTERNS)
+        if unknown:
+            print(f"❗ No detector for invite keys: {sorted(unknown)} (treated as missing)")
+        self.key_res = {k: re.compile(KEY_PATTERNS[k]) for k in keys if k in KEY_PATTERNS}
+        self.cased_res = {k: re.compile(CASED_KEY_PATTERNS[k]) for k in keys if k in CASED_KEY_PATTERNS}
+
+    def detect(self, text, before=None):
+        # Only rules ranked above `before` can still change the result
+        for idx in range(len(self.intents) if before is None else before):
+            if self.intent_res[idx].search(text):
+                return idx
+        return None
+
+
+_compiled = CompiledInviteRules(INVITE_RULES_DE)
+
+
+class InviteChecker:
+    def __init__(self, compiled=None, callsign=None):
+        self.compiled = compiled or _compiled
+        # The planned flight's registration also counts when spoken without hyphen or capitals
+        compact = callsign.replace("-", "").lower() if callsign else ""
+        self.callsign_re = re.compile(rf"\b{re.escape(compact[0])}-?{re.escape(compact[1:])}\b") if len(compact) > 1 else None
+        self.text = ""
+        self.intent_idx = None
+        self.present = set()
+        self._lock = threading.Lock()
+
+    def feed(self, delta):
+        with self._lock:
+            self.text += delta
+            return self._check()
+
+    def update(self, transcript):
+        # Full partial transcript instead of a delta
+        with self._lock:
+            self.text = transcript
+            return self._check()
+
+    def _check(self):
+        normalized = normalize_numbers(self.text)[0].lower()
+        compiled = self.compiled
+
+        idx = compiled.detect(normalized, self.intent_idx)
+        if idx is not None:
+            self.intent_idx = idx
+        if self.intent_idx is None:
+            return InviteStatus(None, (), (), (), False)
+
+        intent = compiled.intents[self.intent_idx]
+        required = compiled.required[intent]
+        # Keys, once heard, stay present: only unresolved ones are searched again
+        for key in required:
+            if key not in self.present and self._heard(key, normalized):
+                self.present.add(key)
+
+        present = tuple(k for k in required if k in self.present)
+        missing = tuple(k for k in required if k not in self.present)
+        return InviteStatus(intent, required, present, missing, not missing)
+
+    def _heard(self, key, normalized):
+        compiled = self.compiled
+        if key in compiled.key_res and compiled.key_res[key].search(normalized):
+            return True
+        if key in compiled.cased_res and compiled.cased_res[key].search(self.text):
+            return True
+        return key == "rufzeichen" and self.callsign_re is not None and bool(self.callsign_re.search(normalized))
+
+    def reset(self):
+        with self._lock:
+            self.text = ""
+            self.intent_idx = None
+            self.present.clear()
+
+
+def check_invite(transcript):
+    return InviteChecker().update(transcript)
+
+
+def format_invite_status(status):
+    if status.intent is None:
+        return ""
+    if status.complete:
+        return f"✅ {status.intent}: vollständig"
+    return f"⚠️ {status.intent}: fehlt {', '.join(status.missing)}"
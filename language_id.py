@@ -0,0 +1,128 @@
+# language_id.py
+# EN/DE language identification. The Whisper encoder runs once: its output feeds one
+# decoder step for the language probabilities and is then reused for the actual decode.
+import re
+import threading
+import torch
+
+from icao_rules_en import WORD_TO_NUMBER_EN
+from icao_rules_de import WORD_TO_NUMBER_DE
+
+LANGUAGES = ("en", "de")
+DEFAULT_LANGUAGE = "en"
+
+# Per-session prior: how strongly earlier utterances of a flight pull the next decision.
+# Short, ambiguous calls ("Danke", "roger") follow the session, clear ones override it.
+PRIOR_WEIGHT = 0.3
+PRIOR_DECAY = 0.8
+
+_token_ids = {}
+
+
+def language_token_ids(tokenizer, languages=LANGUAGES):
+    key = (id(tokenizer), languages)
+    if key not in _token_ids:
+        _token_ids[key] = [tokenizer.convert_tokens_to_ids(f"<|{lang}|>") for lang in languages]
+    return _token_ids[key]
+
+
+class LanguagePrior:
+    def __init__(self, languages=LANGUAGES):
+        self.languages = languages
+        self.probs = [1.0 / len(languages)] * len(languages)
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def combine(self, probs):
+        with self._lock:
+            if not self.observations:
+                return list(probs)
+            mixed = [p ** (1 - PRIOR_WEIGHT) * q ** PRIOR_WEIGHT for p, q in zip(probs, self.probs)]
+        total = sum(mixed)
+        return [m / total for m in mixed]
+
+    def update(self, language):
+        with self._lock:
+            self.probs = [PRIOR_DECAY * q + (1 - PRIOR_DECAY) * (1.0 if lang == language else 0.0)
+                          for lang, q in zip(self.languages, self.probs)]
+            self.observations += 1
+
+    def best(self):
+        with self._lock:
+            return self.languages[max(range(len(self.probs)), key=self.probs.__getitem__)]
+
+
+_priors = {}
+_priors_lock = threading.Lock()
+
+
+def get_language_prior(session_id):
+    key = (session_id or "").replace("-", "").upper()
+    with _priors_lock:
+        if key not in _priors:
+            _priors[key] = LanguagePrior()
+        return _priors[key]
+
+
+def detect_language(processor, model, input_features, prior=None, languages=LANGUAGES):
+    # Returns (language, probs, encoder_outputs) for a single clip
+    with torch.inference_mode():
+        encoder_outputs = model.get_encoder()(torch.as_tensor(input_features))
+        start = torch.full((encoder_outputs.last_hidden_state.shape[0], 1),
+                           model.generation_config.decoder_start_token_id, dtype=torch.long)
+        logits = model(encoder_outputs=encoder_outputs, decoder_input_ids=start).logits[:, -1]
+        ids = language_token_ids(processor.tokenizer, languages)
+        probs = logits[0, ids].float().softmax(-1).tolist()
+
+    if prior is not None:
+        probs = prior.combine(probs)
+    language = languages[max(range(len(languages)), key=probs.__getitem__)]
+    if prior is not None:
+        prior.update(language)
+    return language, probs, encoder_outputs
+
+
+def transcribe_auto(processor, model, input_features, prior=None, speculative=None, waveform=None,
+                    sampling_rate=16000, **generate_kwargs):
+    # Detection costs one decoder step; the decode below reuses the same encoder output
+    language, probs, encoder_outputs = detect_language(processor, model, input_features, prior)
+    generate_kwargs.update(language=language, task="transcribe")
+
+    if speculative is not None:
+        text = speculative.transcribe(waveform, sampling_rate, input_features=input_features, **generate_kwargs)
+    else:
+        with torch.inference_mode():
+            predicted_ids = model.generate(encoder_outputs=encoder_outputs, **generate_kwargs)
+        text = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
+    print(f"Detected language: {language} ({', '.join(f'{l} {p:.2f}' for l, p in zip(LANGUAGES, probs))})")
+    return text, language
+
+
+# Text fallback where no encoder output is at hand (worker pool, realtime text, long recordings)
+_WORDS = {
+    "en": set(WORD_TO_NUMBER_EN) | {
+        "the", "and", "to", "for", "with", "runway", "cleared", "taxi", "request", "holding", "point",
+        "contact", "feet", "ready", "departure", "via", "report", "approach", "wind", "roger", "wilco",
+        "good", "day", "morning", "evening", "on", "at", "is", "downwind", "final", "circuit",
+    },
+    "de": set(WORD_TO_NUMBER_DE) | {
+        "und", "der", "die", "das", "zum", "zur", "nach", "von", "über", "bitte", "erbitte", "piste",
+        "rollen", "rollhalt", "frei", "start", "wechseln", "sie", "fuß", "höhe", "melde", "anflug",
+        "verlassen", "personen", "danke", "wiederhören", "verstanden", "guten", "tag", "morgen", "abend",
+        "auf", "mit", "im", "ist", "bereit", "rollbereit", "platzrunde", "gegenanflug",
+    },
+}
+_TOKEN_RE = re.compile(r"[a-zäöüß]+")
+
+
+def guess_text_language(text, prior=None, default=DEFAULT_LANGUAGE):
+    tokens = _TOKEN_RE.findall(text.lower())
+    scores = {lang: sum(t in words for t in tokens) for lang, words in _WORDS.items()}
+    scores["de"] += sum(ch in "äöüß" for ch in text.lower())
+    if scores["en"] == scores["de"]:
+        language = prior.best() if prior is not None and prior.observations else default
+    else:
+        language = max(scores, key=scores.get)
+    if prior is not None:
+        prior.update(language)
+    return language
@@ -5,25 +5,37 @@ import threading
 import sounddevice as sd
 import websocket
 import time
+from invite_checker import InviteChecker, format_invite_status
+from language_id import guess_text_language
+from transcription_utils import normalize_text_to_callsign
+from transmission_log import get_transmission_log
 
 
 audio_thread = None
 ws_app = None
 stop_event = threading.Event()
 
-API_KEY = os.getenv("OPENAI_API_KEY")
-if API_KEY is None:
-    raise ValueError("❗ OPENAI_API_KEY environment variable not set.")
+# ATC_REALTIME_URL points the client at a local stand-in (see load_test.py) instead of OpenAI
+URL = os.getenv("ATC_REALTIME_URL", "wss://api.openai.com/v1/realtime?intent=transcription")
 
-URL = "wss://api.openai.com/v1/realtime?intent=transcription"
-HEADERS = [
-    "Authorization: Bearer " + API_KEY,
-    "OpenAI-Beta: realtime=v1"
-]
+
+def realtime_headers():
+    # Checked on connect rather than at import, so the module loads without a key.
+    # The local stand-in doesn't authenticate.
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key is None and "api.openai.com" in URL:
+        raise ValueError("❗ OPENAI_API_KEY environment variable not set.")
+    return [
+        "Authorization: Bearer " + (api_key or "local"),
+        "OpenAI-Beta: realtime=v1"
+    ]
 
 SAMPLE_RATE = 16000
 CHANNELS = 1
 
+# "en", "de" or "auto" (let the realtime model detect it per utterance)
+REALTIME_LANGUAGE = os.getenv("ATC_REALTIME_LANGUAGE", "en")
+
 # Shared session holder (thread-safe via dict)
 session_holder = {"id": None}
 session_ready = threading.Event()
@@ -82,8 +94,62 @@ def stop_audio_stream():
         ws_app.close()
         print("🛑 WebSocket closed.")
 
-def start_transcription(output_box=None):
+def session_config(language=REALTIME_LANGUAGE):
+    setup = {
+        "type": "transcription_session.update",
+        "input_audio": {"format": "pcm16"},
+        "input_audio_transcription": {
+            "model": "gpt-4o-mini-transcribe",
+            "prompt": "",
+        },
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 500
+        },
+        "input_audio_noise_reduction": {
+            "type": "near_field"
+        },
+        "include": [
+            "item.input_audio_transcription.logprobs"
+        ]
+    }
+
+    if language != "auto":
+        setup["input_audio_transcription"]["language"] = language   # Explicit language
+    return setup
+
+def invite_check_applies(language, text):
+    # The invite rules are German phrasing; under "auto" the utterance text decides
+    return language == "de" or (language == "auto" and guess_text_language(text) == "de")
+
+def start_transcription(output_box=None, feedback_box=None, language=None, callsign=None):
+    # output_box / feedback_box: anything with .append (the Gradio tab polls plain lists)
     global ws_app, audio_thread
+    language = language or REALTIME_LANGUAGE
+
+    # One completeness checker per German transcription item, fed with every partial.
+    # Under "auto" the partial text is held until it reads as German.
+    checkers = {}
+    partials = {}
+    last_feedback = {}
+
+    def report_invite(item_id, status, final=False):
+        feedback = format_invite_status(status)
+        # Only report changes, deltas arrive every few words
+        if final:
+            last_feedback.pop(item_id, None)
+        elif last_feedback.get(item_id) == feedback:
+            return
+        else:
+            last_feedback[item_id] = feedback
+        if not feedback:
+            return
+        if feedback_box is not None:
+            feedback_box.append(feedback)
+        else:
+            print(feedback)
 
     def on_message_custom(ws, message):
         data = json.loads(message)
@@ -104,8 +170,38 @@ def start_transcription(output_box=None):
             )
             audio_thread.start()
 
-        elif msg_type == "input_audio_transcription":
-            text = data["input_audio_transcription"]["text"]
+        elif msg_type == "conversation.item.input_audio_transcription.delta":
+            item_id = data.get("item_id")
+            delta = data.get("delta", "")
+            checker = checkers.get(item_id)
+            if checker is not None:
+                report_invite(item_id, checker.feed(delta))
+            elif language in ("de", "auto"):
+                partials[item_id] = partials.get(item_id, "") + delta
+                if invite_check_applies(language, partials[item_id]):
+                    checker = checkers[item_id] = InviteChecker(callsign=callsign)
+                    report_invite(item_id, checker.update(partials.pop(item_id)))
+
+        elif msg_type in ("conversation.item.input_audio_transcription.completed", "input_audio_transcription"):
+            if msg_type == "input_audio_transcription":
+                text = data["input_audio_transcription"]["text"]
+            else:
+                text = data.get("transcript", "")
+            item_id = data.get("item_id")
+            partials.pop(item_id, None)
+            checker = checkers.pop(item_id, None)
+            status = None
+            if invite_check_applies(language, text):
+                status = (checker or InviteChecker(callsign=callsign)).update(text)
+                report_invite(item_id, status, final=True)
+            else:
+                last_feedback.pop(item_id, None)
+            intent = status.intent if status is not None else None
+            get_transmission_log().log(
+                callsign=normalize_text_to_callsign(text), transcript=text, intent=intent,
+                context={"missing": list(status.missing)} if intent else None,
+                session=session_holder["id"], source="realtime",
+            )
             if output_box is not None:
                 output_box.append(text)
             else:
@@ -123,33 +219,12 @@ def start_transcription(output_box=None):
         print("✅ Connected to OpenAI Realtime API")
 
         # Initial session creation with configuration (no need for second update)
-        setup = {
-            "type": "transcription_session.update",
-            "input_audio": {"format": "pcm16"},
-            "input_audio_transcription": {
-                "model": "gpt-4o-mini-transcribe",
-                "prompt": "",
-                "language": "en"   # Explicit language
-            },
-            "turn_detection": {
-                "type": "server_vad",
-                "threshold": 0.5,
-                "prefix_padding_ms": 300,
-                "silence_duration_ms": 500
-            },
-            "input_audio_noise_reduction": {
-                "type": "near_field"
-            },
-            "include": [
-                "item.input_audio_transcription.logprobs"
-            ]
-        }
-
+        setup = session_config(language)
         ws.send(json.dumps(setup))
 
     ws_app = websocket.WebSocketApp(
         URL,
-        header=HEADERS,
+        header=realtime_headers(),
         on_open=on_open,
         on_message=on_message_custom,
         on_close=on_close,
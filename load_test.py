@@ -0,0 +1,271 @@
+# load_test.py
+# Capacity test for the live paths. Replays recorded ATC clips as real-time (or --speed x
+# faster) chunk streams from many concurrent sessions and reports what one box sustains.
+# Runs offline: live_stream uses the local RT model, the realtime path the local stand-in.
+#   python load_test.py clips/*.wav --target live_stream --sessions 1,2,4,8
+#   python load_test.py clips/*.wav --target realtime --sessions 4,8,16 --speed 2
+import os
+import json
+import time
+import base64
+import argparse
+import threading
+import numpy as np
+import websocket
+
+from audio_io import load_audio
+from asr_models import SAMPLE_RATE
+from invite_checker import InviteChecker
+from live_transcription import invite_check_applies, session_config
+from realtime_standin import VAD_FRAME
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def build_programs(paths, sessions, gap_s):
+    # Every session plays all clips with silence in between, starting at a different clip
+    # so the sessions don't speak in lockstep
+    clips = [load_audio(p)[0] for p in paths]
+    gap = np.zeros(int(gap_s * SAMPLE_RATE), dtype=np.float32)
+    programs = []
+    for i in range(sessions):
+        order = clips[i % len(clips):] + clips[:i % len(clips)]
+        audio = np.concatenate([part for clip in order for part in (clip, gap)])
+        programs.append((np.clip(audio, -1, 1) * 32767).astype(np.int16))
+    return programs
+
+
+class SessionResult:
+    def __init__(self):
+        self.lags = []          # chunk processing lag, wall seconds
+        self.latencies = []     # utterance end -> text, wall seconds
+        self.dropped_s = 0.0    # audio seconds never processed
+        self.audio_s = 0.0
+        self.missed = 0         # utterances that never produced text
+
+
+def replay_live_stream(program, speech_ends, args, result):
+    # Same calls the Gradio stream and the /live websocket make
+    from app import live_stream
+
+    chunk = int(args.chunk_ms * SAMPLE_RATE / 1000)
+    chunk_s = chunk / SAMPLE_RATE
+    pending = list(speech_ends)
+    buffer_list = []
+    t0 = time.perf_counter()
+
+    for i in range(0, len(program), chunk):
+        due = t0 + (i + chunk) / SAMPLE_RATE / args.speed
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        elif -wait > args.max_backlog_s:
+            # A client this far behind skips audio rather than queue it forever
+            result.dropped_s += chunk_s
+            continue
+
+        buffer_list, text = live_stream(buffer_list, (SAMPLE_RATE, program[i:i + chunk]))
+        done = time.perf_counter()
+        result.lags.append(done - due)
+        result.audio_s += chunk_s
+
+        covered = (i + chunk) / SAMPLE_RATE
+        while pending and pending[0] <= covered:
+            end = pending.pop(0)
+            if text.strip():
+                result.latencies.append(done - (t0 + end / args.speed))
+            else:
+                result.missed += 1
+    result.missed += len(pending)
+
+
+def replay_realtime(program, url, standin, args, result):
+    # Realtime client: same session config as live_transcription, audio from the program
+    chunk = int(args.chunk_ms * SAMPLE_RATE / 1000)
+    state = {"session": None, "t0": None, "ends": {}, "checkers": {}, "partials": {}}
+    ready = threading.Event()
+
+    def sender(ws):
+        ready.wait()
+        if state["session"] is None:
+            return
+        t0 = state["t0"] = time.perf_counter()
+        sent = 0
+        for i in range(0, len(program), chunk):
+            due = t0 + (i + chunk) / SAMPLE_RATE / args.speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            elif -wait > args.max_backlog_s:
+                result.dropped_s += chunk / SAMPLE_RATE
+                continue
+
+            # Lag: audio sent earlier that the server still hasn't run through VAD by now
+            # (less the partial frame it holds back)
+            session = standin.sessions.get(state["session"])
+            if session is not None:
+                backlog = max(0, sent - session.audio_samples - VAD_FRAME)
+                result.lags.append(backlog / SAMPLE_RATE / args.speed)
+
+            ws.send(json.dumps({"type": "input_audio_buffer.append",
+                                "audio": base64.b64encode(program[i:i + chunk].tobytes()).decode("utf-8")}))
+            sent = i + chunk
+            result.audio_s += chunk / SAMPLE_RATE
+
+        # Let the last utterances finish, then hang up
+        deadline = time.perf_counter() + args.drain_s
+        while state["ends"] and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        result.missed += len(state["ends"])
+        ws.close()
+
+    def on_message(ws, message):
+        data = json.loads(message)
+        msg_type = data.get("type", "")
+        item_id = data.get("item_id")
+        if msg_type == "transcription_session.created":
+            state["session"] = data["session"]["id"]
+            ws.send(json.dumps(session_config(args.language)))
+            ready.set()
+        elif msg_type == "input_audio_buffer.speech_stopped":
+            state["ends"][item_id] = data["audio_end_ms"] / 1000
+        elif msg_type == "conversation.item.input_audio_transcription.delta":
+            # Client-side work of start_transcription: completeness check on every German partial
+            delta = data.get("delta", "")
+            checker = state["checkers"].get(item_id)
+            if checker is not None:
+                checker.feed(delta)
+            elif args.language in ("de", "auto"):
+                partial = state["partials"][item_id] = state["partials"].get(item_id, "") + delta
+                if invite_check_applies(args.language, partial):
+                    state["checkers"][item_id] = InviteChecker()
+                    state["checkers"][item_id].update(state["partials"].pop(item_id))
+        elif msg_type == "conversation.item.input_audio_transcription.completed":
+            transcript = data.get("transcript", "")
+            state["partials"].pop(item_id, None)
+            checker = state["checkers"].pop(item_id, None)
+            if invite_check_applies(args.language, transcript):
+                (checker or InviteChecker()).update(transcript)
+            end = state["ends"].pop(item_id, None)
+            if end is not None:
+                result.latencies.append(time.perf_counter() - (state["t0"] + end / args.speed))
+        elif msg_type == "conversation.item.input_audio_transcription.failed":
+            state["ends"].pop(item_id, None)
+            result.missed += 1
+
+    ws = websocket.WebSocketApp(url, on_message=on_message, on_error=lambda ws, e: print("❗Error:", e))
+    threading.Thread(target=sender, args=(ws,), daemon=True).start()
+    ws.run_forever()
+    ready.set()  # unblock the sender if the connection never came up
+
+
+def speech_ends(program):
+    from app import get_speech_timestamps, vad_model
+    audio = program.astype(np.float32) / 32768.0
+    return [ts["end"] / SAMPLE_RATE for ts in get_speech_timestamps(audio, vad_model, sampling_rate=SAMPLE_RATE)]
+
+
+def run_level(sessions, programs, args, ends=None, url=None, standin=None):
+    results = [SessionResult() for _ in range(sessions)]
+    if args.target == "live_stream":
+        targets = [(replay_live_stream, (programs[i], ends[i], args, results[i])) for i in range(sessions)]
+    else:
+        dropped_before = standin.stats["dropped_s"]
+        targets = [(replay_realtime, (programs[i], url, standin, args, results[i])) for i in range(sessions)]
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    threads = [threading.Thread(target=fn, args=a, daemon=True) for fn, a in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    lags = [x for r in results for x in r.lags]
+    latencies = [x for r in results for x in r.latencies]
+    dropped = sum(r.dropped_s for r in results)
+    if standin is not None:
+        dropped += standin.stats["dropped_s"] - dropped_before
+    audio_s = sum(r.audio_s for r in results) + dropped
+    p99_lag = percentile(lags, 0.99) or 0.0
+    return {
+        "sessions": sessions,
+        "audio_s": audio_s,
+        "lag_p50_ms": (percentile(lags, 0.5) or 0.0) * 1000,
+        "lag_p99_ms": p99_lag * 1000,
+        "dropped_s": dropped,
+        "dropped_pct": 100 * dropped / audio_s if audio_s else 0.0,
+        "utterances": len(latencies),
+        "missed": sum(r.missed for r in results),
+        "text_p50_ms": (percentile(latencies, 0.5) or 0.0) * 1000,
+        "text_p99_ms": (percentile(latencies, 0.99) or 0.0) * 1000,
+        "cpu_pct": 100 * cpu / wall / (os.cpu_count() or 1),
+        "sustained": dropped == 0 and p99_lag * 1000 <= args.max_lag_ms,
+    }
+
+
+def print_level(r):
+    mark = "✅" if r["sustained"] else "❗"
+    print(f"{mark} {r['sessions']:>3} sessions | chunk lag p50 {r['lag_p50_ms']:7.1f} ms  p99 {r['lag_p99_ms']:7.1f} ms"
+          f" | dropped {r['dropped_s']:6.1f} s ({r['dropped_pct']:.1f}%)"
+          f" | text p50 {r['text_p50_ms']:7.0f} ms  p99 {r['text_p99_ms']:7.0f} ms ({r['utterances']} utt, {r['missed']} missed)"
+          f" | cpu {r['cpu_pct']:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ATC audio into the live pipelines to find session capacity")
+    parser.add_argument("audio", nargs="+", help="Recorded clips to replay")
+    parser.add_argument("--target", choices=["live_stream", "realtime"], default="live_stream")
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 2 = twice real time")
+    parser.add_argument("--chunk-ms", type=int, default=500, help="Chunk size sent per call/frame")
+    parser.add_argument("--gap-s", type=float, default=2.0, help="Silence between clips")
+    parser.add_argument("--language", default="en", choices=["en", "de", "auto"])
+    parser.add_argument("--max-lag-ms", type=float, default=1000, help="p99 chunk lag still counted as sustained")
+    parser.add_argument("--max-backlog-s", type=float, default=5.0, help="Sessions further behind drop audio")
+    parser.add_argument("--drain-s", type=float, default=30.0, help="Wait for pending transcripts at the end")
+    parser.add_argument("--workers", type=int, default=1, help="Stand-in ASR threads (realtime target)")
+    parser.add_argument("--json", help="Write the per-level results here")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.sessions.split(",")]
+    programs = build_programs(args.audio, max(levels), args.gap_s)
+    print(f"Replaying {len(args.audio)} clips ({len(programs[0]) / SAMPLE_RATE:.0f} s per session) "
+          f"at {args.speed:g}x into {args.target}, {os.cpu_count()} cores")
+
+    ends = url = standin = server = None
+    if args.target == "live_stream":
+        # Reference utterance ends for the latency measurement
+        ends = [speech_ends(p) for p in programs]
+    else:
+        from realtime_standin import RealtimeStandin, serve_in_background
+        standin = RealtimeStandin(workers=args.workers)
+        server, url = serve_in_background(standin)
+
+    results = []
+    try:
+        for sessions in levels:
+            results.append(run_level(sessions, programs, args, ends, url, standin))
+            print_level(results[-1])
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    sustained = [r["sessions"] for r in results if r["sustained"]]
+    best = max(sustained) if sustained else 0
+    print(f"📊 Max sustained: {best} sessions = {best / (os.cpu_count() or 1):.2f} sessions per core "
+          f"(p99 chunk lag <= {args.max_lag_ms:g} ms, no dropped audio)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"target": args.target, "speed": args.speed, "cores": os.cpu_count(),
+                       "levels": results, "max_sustained": best}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# longform_transcription.py
+import numpy as np
+import soundfile as sf
+import soxr
+
+import audio_io
+from transcription_utils import normalize_text_to_callsign, extract_context_from_transcript, get_icao_response, clean_transcript, strip_callsign_from_transcript
+from icao_rules_en import ICAO_RULES_EN
+from icao_rules_de import ICAO_RULES_DE
+from flight_state import FlightStateMachine
+from language_id import get_language_prior, guess_text_language
+
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 10          # read size when streaming the file
+VAD_WINDOW_SECONDS = 60     # audio kept in memory for one VAD pass
+TAIL_MARGIN_SECONDS = 1.0   # speech this close to the window end waits for the next window
+MAX_SEGMENT_SECONDS = 28    # Whisper truncates at 30 s, keep some headroom
+MIN_SEGMENT_SECONDS = 0.3
+
+
+def stream_audio(audio_path, block_seconds=BLOCK_SECONDS):
+    # Yield 16 kHz mono float32 blocks without holding the whole recording in memory
+    try:
+        info = sf.info(audio_path)
+    except RuntimeError:
+        info = None
+
+    if info is None or info.format not in audio_io.FAST_FORMATS:
+        waveform, _ = audio_io.load_audio(audio_path, SAMPLE_RATE)
+        step = block_seconds * SAMPLE_RATE
+        for i in range(0, len(waveform), step):
+            yield waveform[i:i + step]
+        return
+
+    resampler = None
+    if info.samplerate != SAMPLE_RATE:
+        resampler = soxr.ResampleStream(info.samplerate, SAMPLE_RATE, 1, dtype="float32", quality="MQ")
+
+    blocksize = block_seconds * info.samplerate
+    for block in sf.blocks(audio_path, blocksize=blocksize, dtype="float32", always_2d=True):
+        block = audio_io.to_mono(block)
+        if resampler is not None:
+            block = resampler.resample_chunk(np.ascontiguousarray(block), last=False)
+        if len(block):
+            yield block
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+
+def _split_long(start, end):
+    max_len = MAX_SEGMENT_SECONDS * SAMPLE_RATE
+    while end - start > max_len:
+        yield start, start + max_len
+        start += max_len
+    yield start, end
+
+
+def iter_speech_segments(audio_path, vad_model, get_speech_timestamps):
+    # Yields (start_sample, end_sample, waveform) for every speech region, in order
+    window = VAD_WINDOW_SECONDS * SAMPLE_RATE
+    margin = int(TAIL_MARGIN_SECONDS * SAMPLE_RATE)
+    min_len = int(MIN_SEGMENT_SECONDS * SAMPLE_RATE)
+
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0  # absolute sample index of buffer[0]
+    blocks = stream_audio(audio_path)
+
+    while True:
+        block = next(blocks, None)
+        final = block is None
+        if not final:
+            buffer = np.concatenate([buffer, block])
+            if len(buffer) < window:
+                continue
+        if not len(buffer):
+            break
+
+        speech_ts = get_speech_timestamps(buffer, vad_model, sampling_rate=SAMPLE_RATE)
+        keep_from = max(0, len(buffer) - margin)
+
+        for seg in speech_ts:
+            start, end = seg['start'], seg['end']
+            # A segment running into the window edge may continue in the next block
+            if not final and end >= len(buffer) - margin and len(buffer) < 2 * window:
+                keep_from = start
+                break
+            if end - start < min_len:
+                continue
+            for s, e in _split_long(start, end):
+                yield offset + s, offset + e, buffer[s:e].copy()
+            keep_from = max(keep_from, end)
+
+        if final:
+            break
+        buffer = buffer[keep_from:]
+        offset += keep_from
+
+
+def analyse_transmission(text, language, sessions):
+    callsign = normalize_text_to_callsign(text)
+    if language == "auto":
+        # Mixed-language frequencies: route each call by its words, with the aircraft's history as prior
+        language = guess_text_language(text, get_language_prior(callsign) if callsign else None)
+    rules = ICAO_RULES_EN if language == "en" else ICAO_RULES_DE
+    cleaned = clean_transcript(text)
+    context = extract_context_from_transcript(cleaned, language)
+    intent = None
+    if callsign:
+        stripped = strip_callsign_from_transcript(cleaned, callsign, rules)
+        # One phase tracker per aircraft heard in the recording
+        session = sessions.setdefault((callsign, language), FlightStateMachine(language))
+        _, intent = get_icao_response(stripped, callsign, context, language, session=session)
+    return callsign, cleaned, context, intent
+
+
+def transcribe_long_recording(audio_path, transcribe_fn, vad_model, get_speech_timestamps, language="en", batch_size=8):
+    # transcribe_fn takes a list of 16 kHz waveforms and returns one text per waveform
+    batch = []
+    sessions = {}
+
+    def flush():
+        texts = transcribe_fn([wave for _, _, wave in batch])
+        for (start, end, _), text in zip(batch, texts):
+            if not text.strip():
+                continue
+            callsign, cleaned, context, intent = analyse_transmission(text, language, sessions)
+            yield {
+                "start": start / SAMPLE_RATE,
+                "end": end / SAMPLE_RATE,
+                "text": text.strip(),
+                "transcript": cleaned,
+                "callsign": callsign,
+                "intent": intent,
+                "context": context,
+            }
+        batch.clear()
+
+    for segment in iter_speech_segments(audio_path, vad_model, get_speech_timestamps):
+        batch.append(segment)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def _timestamp(seconds):
+    h, rem = divmod(int(seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def format_log_entry(entry):
+    context = " ".join(f"{k}={v}" for k, v in entry["context"].items())
+    return (
+        f"[{_timestamp(entry['start'])}–{_timestamp(entry['end'])}] "
+        f"{entry['callsign'] or '?'} | {entry['intent'] or '-'} | {context or '-'} | {entry['transcript']}"
+    )
@@ -0,0 +1,296 @@
+# multichannel_monitor.py
+# Watches several frequencies on one box: one capture stream per input device, one
+# Silero VAD per channel, and a single ASR batcher shared by all channels.
+#   python multichannel_monitor.py --channel TWR=118.500@1:0 --channel FIS=123.650@1:1 --language de
+#   python multichannel_monitor.py --list-devices
+import os
+import time
+import queue
+import argparse
+import threading
+from collections import namedtuple, deque
+import numpy as np
+import soxr
+import torch
+import sounddevice as sd
+
+from asr_models import SAMPLE_RATE, load_vad_model
+from longform_transcription import analyse_transmission, MAX_SEGMENT_SECONDS, MIN_SEGMENT_SECONDS
+from transmission_log import get_transmission_log
+
+VAD_FRAME = 512          # Silero expects 512-sample frames at 16 kHz
+PRE_ROLL_FRAMES = 10     # ~320 ms kept before a detected speech start
+
+# name: label, frequency: MHz string used as tag, device: sounddevice index/name, index: input channel
+Channel = namedtuple("Channel", ["name", "frequency", "device", "index"])
+Utterance = namedtuple("Utterance", ["channel", "start_time", "end_time", "waveform"])
+
+
+def resolve_device(spec):
+    # "1" -> device index 1, anything else is a name substring for sounddevice
+    if spec is None or str(spec).strip() == "":
+        return None
+    spec = str(spec).strip()
+    return int(spec) if spec.isdigit() else spec
+
+
+def parse_channel(spec):
+    # "TWR=118.500@1:0" -> name TWR, frequency 118.500, device 1, channel 0 (device/channel optional)
+    name, _, rest = spec.partition("=")
+    frequency, _, where = rest.partition("@")
+    device, _, index = where.partition(":")
+    return Channel(name.strip(), frequency.strip() or None, resolve_device(device), int(index or 0))
+
+
+class ChannelSegmenter(threading.Thread):
+    def __init__(self, channel, input_rate, out_queue, vad_threshold=0.5, min_silence_ms=400, max_backlog_s=30):
+        super().__init__(name=f"vad-{channel.name}", daemon=True)
+        self.channel = channel
+        self.out_queue = out_queue
+        # Silero keeps recurrent state, so every channel gets its own model instance
+        vad_model, utils = load_vad_model()
+        VADIterator = utils[3]
+        self.vad = VADIterator(vad_model, threshold=vad_threshold, sampling_rate=SAMPLE_RATE,
+                               min_silence_duration_ms=min_silence_ms, speech_pad_ms=100)
+        self.resampler = None
+        if input_rate != SAMPLE_RATE:
+            self.resampler = soxr.ResampleStream(input_rate, SAMPLE_RATE, 1, dtype="float32", quality="MQ")
+        # Blocks from the audio callback; bounded so a stalled channel can't eat memory
+        self.blocks = queue.Queue(maxsize=max(1, int(max_backlog_s * input_rate / 1024)))
+        self.stop_event = threading.Event()
+        self.stats = {"utterances": 0, "dropped_s": 0.0, "input_rate": input_rate}
+
+    def push(self, block):
+        # Called from the audio callback: never block
+        try:
+            self.blocks.put_nowait(block)
+        except queue.Full:
+            self.stats["dropped_s"] += len(block) / self.stats["input_rate"]
+
+    def _emit(self, frames, started):
+        waveform = np.concatenate(frames)
+        if len(waveform) >= MIN_SEGMENT_SECONDS * SAMPLE_RATE:
+            self.stats["utterances"] += 1
+            self.out_queue.put(Utterance(self.channel, started, time.time(), waveform))
+
+    def run(self):
+        pending = np.zeros(0, dtype=np.float32)
+        pre_roll = deque(maxlen=PRE_ROLL_FRAMES)
+        speech, started = None, None
+        max_frames = MAX_SEGMENT_SECONDS * SAMPLE_RATE // VAD_FRAME
+
+        while not self.stop_event.is_set():
+            try:
+                block = self.blocks.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if self.resampler is not None:
+                block = self.resampler.resample_chunk(block)
+            pending = np.concatenate([pending, block])
+
+            n = len(pending) // VAD_FRAME
+            for frame in pending[:n * VAD_FRAME].reshape(n, VAD_FRAME):
+                event = self.vad(torch.from_numpy(frame.copy()))
+                if speech is not None:
+                    speech.append(frame)
+                else:
+                    pre_roll.append(frame)
+
+                if event and "start" in event and speech is None:
+                    speech, started = list(pre_roll), time.time()
+                    pre_roll.clear()
+                elif speech is not None and ((event and "end" in event) or len(speech) >= max_frames):
+                    self._emit(speech, started)
+                    speech = None
+                    if not (event and "end" in event):
+                        # Forced split of a long transmission, keep listening in speech state
+                        speech, started = [], time.time()
+            pending = pending[n * VAD_FRAME:]
+
+        if speech:
+            self._emit(speech, started)
+
+
+class MultiChannelMonitor:
+    def __init__(self, channels, transcribe_fn, language="en", batch_size=8, batch_window_ms=100, on_result=None):
+        # transcribe_fn takes a list of 16 kHz waveforms and returns one text per waveform
+        self.channels = channels
+        self.transcribe_fn = transcribe_fn
+        self.language = language
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.on_result = on_result
+        self.utterances = queue.Queue()
+        self.sessions = {}  # one flight state per callsign, shared across frequencies
+        self.segmenters = {}
+        self.streams = []
+        self.stop_event = threading.Event()
+        self.log = get_transmission_log()
+        self.stats = {"batches": 0, "transmissions": 0, "asr_s": 0.0, "failed_batches": 0, "failed_utterances": 0}
+
+    def start(self):
+        # One InputStream per device, each callback fans its columns out to the channel segmenters
+        by_device = {}
+        for channel in self.channels:
+            by_device.setdefault(channel.device, []).append(channel)
+
+        for device, channels in by_device.items():
+            info = sd.query_devices(device, "input")
+            rate = int(info["default_samplerate"])
+            num_inputs = max(c.index for c in channels) + 1
+            if num_inputs > info["max_input_channels"]:
+                raise ValueError(f"Device {info['name']} has {info['max_input_channels']} inputs, channel {num_inputs - 1} requested")
+
+            segmenters = []
+            for channel in channels:
+                segmenter = ChannelSegmenter(channel, rate, self.utterances)
+                self.segmenters[channel.name] = segmenter
+                segmenters.append(segmenter)
+                segmenter.start()
+
+            def callback(indata, frames, time_info, status, segmenters=segmenters):
+                if status:
+                    print("Audio error:", status)
+                for segmenter in segmenters:
+                    segmenter.push(indata[:, segmenter.channel.index].copy())
+
+            stream = sd.InputStream(device=device, channels=num_inputs, samplerate=rate, dtype="float32",
+                                    blocksize=1024, callback=callback)
+            stream.start()
+            self.streams.append(stream)
+            print(f"🎙️ {info['name']} @ {rate} Hz: {', '.join(f'{c.name} ({c.frequency})' for c in channels)}")
+
+        self.batcher = threading.Thread(target=self._batch_loop, name="monitor-asr", daemon=True)
+        self.batcher.start()
+        return self
+
+    def stop(self):
+        for stream in self.streams:
+            stream.stop()
+            stream.close()
+        for segmenter in self.segmenters.values():
+            segmenter.stop_event.set()
+            segmenter.join()
+        self.stop_event.set()
+        self.batcher.join()
+
+    def _next_batch(self):
+        try:
+            batch = [self.utterances.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        # Utterances from every channel share one decoder batch
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.utterances.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not (self.stop_event.is_set() and self.utterances.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                texts = self.transcribe_fn([u.waveform for u in batch])
+            except Exception as e:
+                # Lose this batch, not the monitor: the other channels keep being transcribed
+                self.stats["failed_batches"] += 1
+                self.stats["failed_utterances"] += len(batch)
+                print(f"❗ Transcription failed for {len(batch)} utterances "
+                      f"({', '.join(sorted({u.channel.name for u in batch}))}): {e}")
+                continue
+            asr_s = time.perf_counter() - start
+            self.stats["batches"] += 1
+            self.stats["asr_s"] += asr_s
+
+            for utterance, text in zip(batch, texts):
+                if text.strip():
+                    try:
+                        self._handle(utterance, text, asr_s)
+                    except Exception as e:
+                        self.stats["failed_utterances"] += 1
+                        print(f"❗ [{utterance.channel.name}] Could not process transmission: {e}")
+
+    def _handle(self, utterance, text, asr_s):
+        channel = utterance.channel
+        callsign, cleaned, context, intent = analyse_transmission(text, self.language, self.sessions)
+        result = {
+            "time": utterance.start_time,
+            "channel": channel.name,
+            "frequency": channel.frequency,
+            "callsign": callsign,
+            "transcript": cleaned,
+            "intent": intent,
+            "context": context,
+            "latency_ms": (time.time() - utterance.end_time) * 1000,
+        }
+        self.stats["transmissions"] += 1
+        self.log.log(callsign=callsign, transcript=cleaned, intent=intent, context=context, ts=utterance.start_time,
+                     session=channel.name, source="monitor", frequency=channel.frequency,
+                     asr_ms=asr_s * 1000, total_ms=result["latency_ms"])
+        print(f"[{channel.name} {channel.frequency}] {callsign or '?'}: {cleaned}" + (f"  ({intent})" if intent else ""))
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def health(self):
+        return {
+            "queued": self.utterances.qsize(),
+            "channels": {name: dict(s.stats, backlog=s.blocks.qsize()) for name, s in self.segmenters.items()},
+            **self.stats,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor several frequencies at once")
+    parser.add_argument("--channel", action="append", default=[],
+                        help="NAME=FREQ@DEVICE:INDEX, e.g. TWR=118.500@1:0 (repeatable)")
+    parser.add_argument("--language", default="en", choices=["en", "de", "auto"])
+    parser.add_argument("--workers", type=int, default=0, help="ASR worker processes (0 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--list-devices", action="store_true")
+    args = parser.parse_args()
+
+    if args.list_devices:
+        print(sd.query_devices())
+        return
+
+    specs = args.channel or [s for s in os.getenv("ATC_MONITOR_CHANNELS", "").split(",") if s.strip()]
+    if not specs:
+        parser.error("no channels given (--channel or ATC_MONITOR_CHANNELS)")
+    channels = [parse_channel(s) for s in specs]
+
+    # A fixed channel language is forced on the decoder; "auto" leaves detection to Whisper
+    generate_kwargs = {"language": args.language} if args.language != "auto" else {}
+
+    pool = None
+    if args.workers > 0:
+        from asr_worker_pool import ASRWorkerPool
+        pool = ASRWorkerPool(num_workers=args.workers, max_batch_size=args.batch_size).start()
+        transcribe_fn = lambda waveforms: [f.result() for f in [pool.submit(w, **generate_kwargs) for w in waveforms]]
+    else:
+        from asr_models import load_hf_model, transcribe_batch
+        processor, model = load_hf_model()
+        transcribe_fn = lambda waveforms: transcribe_batch(processor, model, waveforms, **generate_kwargs)
+
+    monitor = MultiChannelMonitor(channels, transcribe_fn, args.language, args.batch_size).start()
+    try:
+        while True:
+            time.sleep(30)
+            print(f"📊 {monitor.health()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
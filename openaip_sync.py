@@ -0,0 +1,212 @@
+# openaip_sync.py
+# Keeps the OpenAIP snapshots in openaip_data/ current without per-request API calls.
+#   python openaip_sync.py                  # fetch airports + airspaces, write changed snapshots
+#   python openaip_sync.py --dry-run        # only report what changed
+# A running server picks up a replaced snapshot on its next refresh() and swaps in
+# indexes rebuilt only for the changed features.
+import os
+import json
+import time
+import argparse
+import threading
+import requests
+
+import frequency_retrieval
+from frequency_retrieval import AIRPORT_FILE, airport, build_airport_index
+from airspace_index import AIRSPACE_FILE, airspaces_from_features, get_airspace_index, set_airspace_index
+from api_frequencies import API_KEY as DEFAULT_API_KEY
+
+OPENAIP_URL = "https://api.core.openaip.net/api"
+API_KEY = os.getenv("OPENAIP_API_KEY", DEFAULT_API_KEY)
+PAGE_SIZE = 1000
+RELOAD_INTERVAL = float(os.getenv("ATC_OPENAIP_RELOAD_S", "10"))
+# A fetch returning fewer features than this share of the current snapshot is treated as a
+# failed or truncated download, not as mass removals
+MIN_KEEP_FRACTION = float(os.getenv("ATC_OPENAIP_MIN_KEEP", "0.9"))
+
+# dataset -> (API endpoint, snapshot file)
+DATASETS = {
+    "airports": ("airports", AIRPORT_FILE),
+    "airspaces": ("airspaces", AIRSPACE_FILE),
+}
+
+
+def fetch_items(endpoint, country="DE", page_size=PAGE_SIZE):
+    items, page = [], 1
+    with requests.Session() as session:
+        session.headers.update({"x-openaip-api-key": API_KEY, "Accept": "application/json"})
+        while True:
+            resp = session.get(f"{OPENAIP_URL}/{endpoint}", params={"country": country, "page": page, "limit": page_size},
+                               timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+            items.extend(data.get("items", []))
+            print(f"  {endpoint}: page {page}/{data.get('totalPages', '?')} ({len(items)} items)")
+            if not data.get("items") or page >= data.get("totalPages", page):
+                return items
+            page += 1
+
+
+def to_feature(item, feature_id):
+    # Same layout as the exported snapshots: everything but the geometry goes into properties
+    properties = {k: v for k, v in item.items() if k != "geometry"}
+    return {"type": "Feature", "id": feature_id, "properties": properties, "geometry": item.get("geometry")}
+
+
+def read_snapshot(path):
+    with open(path, "r") as f:
+        return json.load(f)["features"]
+
+
+def write_snapshot(path, features):
+    # Write next to the target and rename: readers see the old file or the new one, never half of it
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _versions(features):
+    return {f["properties"]["_id"]: f["properties"].get("updatedAt") for f in features if f["properties"].get("_id")}
+
+
+def diff_features(old, new):
+    return diff_versions(_versions(old), _versions(new))
+
+
+def diff_versions(old_versions, new_versions):
+    # By OpenAIP _id; a feature counts as changed when its updatedAt moved
+    return {
+        "added": [i for i in new_versions if i not in old_versions],
+        "changed": [i for i, v in new_versions.items() if i in old_versions and old_versions[i] != v],
+        "removed": [i for i in old_versions if i not in new_versions],
+    }
+
+
+def has_changes(changes):
+    return any(changes.values())
+
+
+def format_changes(dataset, changes):
+    return f"{dataset}: {len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed"
+
+
+def sync(datasets=tuple(DATASETS), country="DE", dry_run=False, force=False):
+    result = {}
+    for dataset in datasets:
+        endpoint, path = DATASETS[dataset]
+        start = time.time()
+        items = fetch_items(endpoint, country)
+        new = [to_feature(item, i + 1) for i, item in enumerate(items)]
+        old = read_snapshot(path) if os.path.exists(path) else []
+        changes = diff_features(old, new)
+        result[dataset] = changes
+        print(f"{'🔍' if dry_run else '✅'} {format_changes(dataset, changes)} ({time.time() - start:.1f}s)")
+        if not new:
+            print(f"❗ {dataset}: fetch returned nothing, keeping the snapshot")
+            continue
+        if len(new) < MIN_KEEP_FRACTION * len(old) and not force:
+            print(f"❗ {dataset}: got {len(new)} features for {len(old)} in the snapshot, keeping the snapshot "
+                  f"(--force to write anyway)")
+            continue
+        if has_changes(changes) and not dry_run:
+            write_snapshot(path, new)
+    return result
+
+
+# In-process side: apply a replaced snapshot to the live indexes
+
+_listeners = []
+_state = {"mtimes": {}, "checked": 0.0}
+_apply_lock = threading.Lock()
+
+
+def on_sync(callback):
+    # callback(dataset, changes, features) after the new index is in place
+    _listeners.append(callback)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def apply_airports(features):
+    changes = diff_features(airport["features"], features)
+    if has_changes(changes):
+        # Build the ICAO lookup first so the feature list and the index are swapped back to back;
+        # the airport dict object is imported by name elsewhere, so only its feature list changes
+        index = build_airport_index(features)
+        airport["features"] = features
+        frequency_retrieval.airport_index = index
+    return changes
+
+
+def apply_airspaces(features):
+    current = get_airspace_index()
+    new = airspaces_from_features(features)
+    old_versions = dict(zip(current.airspaces["_id"], current.airspaces.get("updatedAt", [None] * len(current.airspaces))))
+    new_versions = dict(zip(new["_id"], new["updatedAt"])) if not new.empty else {}
+    changes = diff_versions(old_versions, new_versions)
+    if has_changes(changes):
+        upserts = new[new["_id"].isin(set(changes["added"]) | set(changes["changed"]))].reset_index(drop=True)
+        set_airspace_index(current.with_changes(upserts, changes["removed"]))
+    return changes
+
+
+APPLY = {"airports": apply_airports, "airspaces": apply_airspaces}
+
+
+def reload_snapshots(force=False):
+    applied = {}
+    with _apply_lock:
+        for dataset, (_, path) in DATASETS.items():
+            mtime = _mtime(path)
+            if mtime is None or (mtime == _state["mtimes"].get(dataset) and not force):
+                continue
+            _state["mtimes"][dataset] = mtime
+            start = time.time()
+            try:
+                features = read_snapshot(path)
+                changes = APPLY[dataset](features)
+            except Exception as e:
+                # Keep serving the previous index until the file changes again
+                print(f"❗ OpenAIP {dataset} reload failed: {e}")
+                continue
+            if has_changes(changes):
+                print(f"✅ Reloaded {format_changes(dataset, changes)} in {(time.time() - start) * 1000:.0f} ms")
+                applied[dataset] = (changes, features)
+
+    for dataset, (changes, features) in applied.items():
+        for callback in _listeners:
+            callback(dataset, changes, features)
+    return applied
+
+
+def refresh():
+    # Cheap enough for every request: one stat per snapshot at most every RELOAD_INTERVAL
+    now = time.monotonic()
+    if now - _state["checked"] > RELOAD_INTERVAL:
+        _state["checked"] = now
+        reload_snapshots()
+
+
+# The indexes were just loaded from these files
+for _dataset, (_, _path) in DATASETS.items():
+    _state["mtimes"][_dataset] = _mtime(_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch OpenAIP data and update the local snapshots")
+    parser.add_argument("--dataset", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--country", default="DE")
+    parser.add_argument("--dry-run", action="store_true", help="Only report changes")
+    parser.add_argument("--force", action="store_true", help="Write even if far fewer features came back")
+    args = parser.parse_args()
+    sync(args.dataset, args.country, args.dry_run, args.force)
+
+
+if __name__ == "__main__":
+    main()
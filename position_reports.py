@@ -0,0 +1,142 @@
+# position_reports.py
+# Nearest-airfield lookups over the OpenAIP airports (BallTree, haversine metric) and
+# position reports relative to an airfield, e.g. "5 miles south of the airfield at 3000 feet".
+import os
+import math
+import threading
+from collections import namedtuple
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from frequency_retrieval import airport
+import openaip_sync
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_NM = 1.852
+REPORT_DISTANCE_NM = float(os.getenv("ATC_REPORT_DISTANCE_NM", "5"))
+REPORT_ALTITUDE_FT = 3000
+
+# bearing: true bearing from the airfield to the position, distance in nautical miles
+Airfield = namedtuple("Airfield", ["name", "icao", "lat", "lon", "distance_nm", "bearing"])
+PositionReport = namedtuple("PositionReport", ["distance_nm", "bearing", "altitude_ft", "reference"])
+
+DIRECTIONS = {
+    "en": ["north", "north-east", "east", "south-east", "south", "south-west", "west", "north-west"],
+    "de": ["nördlich", "nordöstlich", "östlich", "südöstlich", "südlich", "südwestlich", "westlich", "nordwestlich"],
+}
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = math.sin(dlon) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def distance_nm(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h)) / KM_PER_NM
+
+
+def destination(lat, lon, bearing, nm):
+    # Point `nm` nautical miles from (lat, lon) on the given true bearing
+    d = nm * KM_PER_NM / EARTH_RADIUS_KM
+    lat1, lon1, brg = map(math.radians, (lat, lon, bearing))
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(brg))
+    lon2 = lon1 + math.atan2(math.sin(brg) * math.sin(d) * math.cos(lat1), math.cos(d) - math.sin(lat1) * math.sin(lat2))
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+def compass_direction(bearing, language="en"):
+    names = DIRECTIONS.get(language, DIRECTIONS["en"])
+    return names[int((bearing % 360) / 45 + 0.5) % 8]
+
+
+class AirfieldIndex:
+    def __init__(self, features):
+        rows = []
+        for feature in features:
+            coords = feature.get("geometry", {}).get("coordinates", [])
+            if len(coords) >= 2:
+                props = feature.get("properties", {})
+                rows.append((props.get("name", ""), (props.get("icaoCode") or "").upper(), coords[1], coords[0]))
+        self.names = [r[0] for r in rows]
+        self.icaos = [r[1] for r in rows]
+        self.latlon = np.array([(r[2], r[3]) for r in rows], dtype=float).reshape(-1, 2)
+        self.by_icao = {}
+        for i, icao in enumerate(self.icaos):
+            if icao:
+                self.by_icao.setdefault(icao, i)  # first occurrence wins, like airport_index
+        self.tree = BallTree(np.radians(self.latlon), metric="haversine")
+
+    def coords(self, icao):
+        i = self.by_icao.get((icao or "").upper())
+        return None if i is None else tuple(self.latlon[i])
+
+    def nearest(self, lat, lon, k=3, max_nm=None):
+        # Closest airfields first, each with distance and bearing from the airfield to (lat, lon)
+        k = min(k, len(self.names))
+        if k == 0:
+            return []
+        dist, idx = self.tree.query(np.radians([[lat, lon]]), k=k)
+        result = []
+        for d, i in zip(dist[0], idx[0]):
+            nm = d * EARTH_RADIUS_KM / KM_PER_NM
+            if max_nm is not None and nm > max_nm:
+                break
+            a_lat, a_lon = self.latlon[i]
+            result.append(Airfield(self.names[i], self.icaos[i] or None, a_lat, a_lon, nm,
+                                   initial_bearing(a_lat, a_lon, lat, lon)))
+        return result
+
+
+def format_position_report(report, language="en"):
+    miles = max(1, int(round(report.distance_nm)))
+    direction = compass_direction(report.bearing, language)
+    altitude = int(round(report.altitude_ft / 100.0)) * 100
+    if language == "de":
+        reference = "vom Flugplatz" if report.reference is None else f"von {report.reference}"
+        return f"{miles} {'Meile' if miles == 1 else 'Meilen'} {direction} {reference}, in {altitude} Fuß Höhe"
+    reference = "the airfield" if report.reference is None else report.reference
+    return f"{miles} {'mile' if miles == 1 else 'miles'} {direction} of {reference} at {altitude} feet"
+
+
+def describe_position(lat, lon, altitude_ft, language="en", index=None):
+    # Live use: a position relative to the nearest airfield
+    nearest = (index or get_airfield_index()).nearest(lat, lon, k=1)
+    if not nearest:
+        return None
+    a = nearest[0]
+    report = PositionReport(a.distance_nm, a.bearing, altitude_ft, a.name.title() or a.icao)
+    return format_position_report(report, language)
+
+
+def arrival_report(arr, inbound_from, cruise_altitude=None, distance=REPORT_DISTANCE_NM):
+    # Report point `distance` NM out on the inbound track: arr and inbound_from are (lat, lon),
+    # inbound_from being the departure or the last reporting point before the destination
+    bearing = initial_bearing(arr[0], arr[1], inbound_from[0], inbound_from[1])
+    altitude = min(float(cruise_altitude), REPORT_ALTITUDE_FT) if cruise_altitude else REPORT_ALTITUDE_FT
+    return PositionReport(min(distance, distance_nm(*arr, *inbound_from)), bearing, altitude, None)
+
+
+_index = {"current": None}
+_lock = threading.Lock()
+
+
+def get_airfield_index():
+    with _lock:
+        if _index["current"] is None:
+            _index["current"] = AirfieldIndex(airport["features"])
+        return _index["current"]
+
+
+def _on_sync(dataset, changes, features):
+    if dataset == "airports":
+        index = AirfieldIndex(features)
+        with _lock:
+            _index["current"] = index
+
+
+openaip_sync.on_sync(_on_sync)
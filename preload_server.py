@@ -0,0 +1,131 @@
+# preload_server.py
+# Loads every read-only asset once, then forks API workers that share those pages
+# copy-on-write. Only thread-free state is preloaded (HF weights, VAD, airports,
+# airspace index); anything that starts threads - the faster-whisper/CTranslate2
+# model, the transmission log writer - is created inside each worker, so the
+# parent stays single-threaded and (re)forking from it stays safe.
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+# Workers run inference in-process on the inherited weights; a nested process pool would double them
+os.environ["ATC_ASR_WORKERS"] = "0"
+
+
+def memory_report(pid="self"):
+    # Rss counts shared pages in every process, Pss splits them between sharers
+    report = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    report[key] = int(rest.split()[0]) // 1024  # MiB
+    except OSError:
+        pass
+    return report
+
+
+def preload():
+    start = time.time()
+    import api_server  # imports app: Whisper, Silero VAD, airports, airspace index
+    import threading
+    from airspace_index import get_airspace_index
+
+    # Build lazily created structures now so the children inherit them
+    get_airspace_index()
+
+    # Freeze everything allocated so far: the cyclic GC then never writes to these
+    # object headers in the children, which would otherwise un-share their pages
+    gc.collect()
+    gc.freeze()
+    if threading.active_count() > 1:
+        print(f"❗ Preload left threads running in the parent: {[t.name for t in threading.enumerate()]}")
+    print(f"Preloaded assets in {time.time() - start:.1f}s, parent memory: {memory_report()}")
+    return api_server.api
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(api, sock, threads):
+    import torch
+    import uvicorn
+
+    torch.set_num_threads(threads)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Thread-owning state, per worker
+    import app as atc_app
+    from transmission_log import get_transmission_log
+    atc_app.get_rt_model()
+    get_transmission_log()
+    config = uvicorn.Config(api, log_level="info")
+    server = uvicorn.Server(config)
+    print(f"Worker {os.getpid()} serving, memory: {memory_report()}")
+    server.run(sockets=[sock])
+    os._exit(0)
+
+
+def fork_worker(api, sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(api, sock, threads)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def serve(host, port, workers, threads):
+    api = preload()
+    sock = bind_socket(host, port)
+    children = {fork_worker(api, sock, threads) for _ in range(workers)}
+    print(f"Forked {len(children)} workers on {host}:{port}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Restart crashed workers from the (still pristine) parent
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"❗ Worker {pid} exited ({status}), forking a replacement")
+            children.add(fork_worker(api, sock, threads))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers sharing preloaded models")
+    parser.add_argument("--host", default=os.getenv("ATC_API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ATC_API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=2, help="torch intra-op threads per worker")
+    args = parser.parse_args()
+    sys.exit(serve(args.host, args.port, args.workers, args.threads))
@@ -0,0 +1,86 @@
+# prompt_biasing.py
+import threading
+from transcription_utils import ICAO_TO_LETTER
+from frequency_retrieval import airport, get_airport_by_icao
+from flight_state import reset_flight_session
+
+LETTER_TO_ICAO = {letter: word.capitalize() for word, letter in ICAO_TO_LETTER.items()}
+
+# Whisper accepts at most 224 prompt tokens; stay well below that
+MAX_PROMPT_WORDS = 80
+
+_flights = {}
+_lock = threading.Lock()
+
+
+def _key(callsign):
+    return callsign.replace("-", "").upper() if callsign else None
+
+
+def spell_callsign(callsign):
+    return " ".join(LETTER_TO_ICAO.get(c, c) for c in callsign.upper() if c.isalnum())
+
+
+class FlightBias:
+    def __init__(self, callsign, terms):
+        self.callsign = callsign
+        self.terms = terms
+        words = ", ".join(terms).split()
+        self.prompt = " ".join(words[:MAX_PROMPT_WORDS])
+        self.hotwords = " ".join(t for t in terms if " " not in t)
+        self._hf_prompt_ids = {}
+        self._rt_prompt_tokens = {}
+
+    def prompt_ids(self, processor):
+        # Tokenized once per flight and processor, reused for every utterance
+        key = id(processor)
+        if key not in self._hf_prompt_ids:
+            self._hf_prompt_ids[key] = processor.get_prompt_ids(self.prompt, return_tensors="pt")
+        return self._hf_prompt_ids[key]
+
+    def rt_prompt_tokens(self, rt_model):
+        # faster-whisper takes token ids as initial_prompt and skips re-encoding them
+        key = id(rt_model)
+        if key not in self._rt_prompt_tokens:
+            encoding = rt_model.hf_tokenizer.encode(" " + self.prompt.strip(), add_special_tokens=False)
+            self._rt_prompt_tokens[key] = list(encoding.ids)
+        return self._rt_prompt_tokens[key]
+
+
+def _airport_terms(icao):
+    terms = [icao.upper()]
+    feature = get_airport_by_icao(icao, airport)
+    if feature:
+        name = feature.get("properties", {}).get("name", "")
+        terms.extend(part.title() for part in name.replace("/", "-").split("-") if part)
+    return terms
+
+
+def register_flight(cs, airplane_type, dep, arr, position, frequencies=()):
+    # frequencies: iterable of (station name, value) pairs from the checklist
+    terms = [cs.upper(), spell_callsign(cs), airplane_type]
+    terms += _airport_terms(dep) + _airport_terms(arr)
+    if position:
+        terms.append(position)
+    for name, value in frequencies:
+        terms.append(f"{name.title()} {str(value).replace(' MHz', '')}")
+
+    seen = set()
+    unique_terms = [t for t in terms if t and not (t in seen or seen.add(t))]
+
+    bias = FlightBias(cs.upper(), unique_terms)
+    with _lock:
+        _flights[_key(cs)] = bias
+    # A new plan is a new flight: the phase tracking starts over at the first phase
+    reset_flight_session(cs)
+    print(f"Prompt bias for {cs}: {bias.prompt}")
+    return bias
+
+
+def get_flight_bias(callsign=None):
+    # Only the caller's own flight: with several users, "the last planned flight" would
+    # bias one pilot's audio towards another's callsign and airports
+    if not callsign:
+        return None
+    with _lock:
+        return _flights.get(_key(callsign))
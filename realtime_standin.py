@@ -0,0 +1,210 @@
+# realtime_standin.py
+# Local stand-in for the OpenAI realtime transcription socket, so live_transcription.py and
+# load_test.py run offline. Speaks the same events: Silero VAD per session does the turn
+# detection, the faster-whisper RT model transcribes. Point the client at it with
+#   python realtime_standin.py --port 8765
+#   ATC_REALTIME_URL=ws://127.0.0.1:8765/v1/realtime?intent=transcription python app.py
+import os
+import json
+import time
+import queue
+import base64
+import socket
+import asyncio
+import argparse
+import threading
+from collections import deque
+import numpy as np
+import torch
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from asr_models import SAMPLE_RATE, load_rt_model, load_vad_model
+
+VAD_FRAME = 512
+ASR_WORKERS = int(os.getenv("ATC_STANDIN_WORKERS", "1"))
+ASR_QUEUE = int(os.getenv("ATC_STANDIN_QUEUE", "32"))
+
+
+class StandinSession:
+    def __init__(self, session_id, send):
+        self.id = session_id
+        self.send = send  # thread-safe: queues an event for the websocket
+        self.language = None
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.speech = None
+        self.audio_samples = 0   # samples run through VAD so far
+        self.items = 0
+        # Silero keeps recurrent state, so every session gets its own model instance
+        self.vad_model, self.vad_utils = load_vad_model()
+        self.configure({})
+
+    def configure(self, setup):
+        transcription = setup.get("input_audio_transcription") or {}
+        vad = setup.get("turn_detection") or {}
+        self.language = transcription.get("language")
+        self.prefix_ms = vad.get("prefix_padding_ms", 300)
+        VADIterator = self.vad_utils[3]
+        self.vad = VADIterator(self.vad_model, threshold=vad.get("threshold", 0.5), sampling_rate=SAMPLE_RATE,
+                               min_silence_duration_ms=vad.get("silence_duration_ms", 500), speech_pad_ms=30)
+        # Audio kept from before the detected start, like the API's prefix padding
+        self.prefix = deque(maxlen=max(1, self.prefix_ms * SAMPLE_RATE // 1000 // VAD_FRAME))
+
+    def feed(self, pcm16):
+        # Returns finished utterances as (item_id, audio_end_ms, waveform)
+        audio = np.frombuffer(pcm16, dtype=np.int16).astype(np.float32) / 32768.0
+        self.pending = np.concatenate([self.pending, audio])
+        n = len(self.pending) // VAD_FRAME
+        frames = self.pending[:n * VAD_FRAME].reshape(n, VAD_FRAME)
+        self.pending = self.pending[n * VAD_FRAME:]
+
+        finished = []
+        for frame in frames:
+            event = self.vad(torch.from_numpy(frame.copy()))
+            self.audio_samples += VAD_FRAME
+            if self.speech is not None:
+                self.speech[1].append(frame)
+            else:
+                self.prefix.append(frame)
+
+            if event and "start" in event and self.speech is None:
+                self.items += 1
+                item_id = f"item_{self.id}_{self.items}"
+                self.send({"type": "input_audio_buffer.speech_started", "item_id": item_id,
+                           "audio_start_ms": self._ms(self.audio_samples - len(self.prefix) * VAD_FRAME)})
+                self.speech = (item_id, list(self.prefix))
+                self.prefix.clear()
+            elif event and "end" in event and self.speech is not None:
+                item_id, speech = self.speech
+                end_ms = self._ms(self.audio_samples)
+                self.send({"type": "input_audio_buffer.speech_stopped", "item_id": item_id, "audio_end_ms": end_ms})
+                self.send({"type": "input_audio_buffer.committed", "item_id": item_id})
+                finished.append((item_id, end_ms, np.concatenate(speech)))
+                self.speech = None
+        return finished
+
+    @staticmethod
+    def _ms(samples):
+        return int(samples * 1000 / SAMPLE_RATE)
+
+
+class RealtimeStandin:
+    def __init__(self, rt_model=None, workers=ASR_WORKERS, max_queue=ASR_QUEUE):
+        self.rt_model = rt_model or load_rt_model()
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.sessions = {}
+        self.stats = {"sessions": 0, "utterances": 0, "failed": 0, "dropped_s": 0.0, "asr_s": 0.0}
+        self._lock = threading.Lock()
+        self.app = FastAPI(title="Realtime stand-in")
+        self.app.add_api_websocket_route("/v1/realtime", self._handle)
+        for i in range(workers):
+            threading.Thread(target=self._asr_loop, name=f"standin-asr-{i}", daemon=True).start()
+
+    async def _handle(self, websocket: WebSocket):
+        await websocket.accept()
+        loop = asyncio.get_running_loop()
+
+        def send(event):
+            asyncio.run_coroutine_threadsafe(websocket.send_text(json.dumps(event)), loop)
+
+        with self._lock:
+            self.stats["sessions"] += 1
+            session_id = f"sess_{self.stats['sessions']}"
+        session = await run_in_threadpool(StandinSession, session_id, send)
+        self.sessions[session_id] = session
+        send({"type": "transcription_session.created", "session": {"id": session_id}})
+        try:
+            while True:
+                event = json.loads(await websocket.receive_text())
+                if event.get("type") == "transcription_session.update":
+                    await run_in_threadpool(session.configure, event)
+                    send({"type": "transcription_session.updated", "session": {"id": session_id}})
+                elif event.get("type") == "input_audio_buffer.append":
+                    finished = await run_in_threadpool(session.feed, base64.b64decode(event["audio"]))
+                    for item in finished:
+                        self._enqueue(session, *item)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.sessions.pop(session_id, None)
+
+    def _enqueue(self, session, item_id, end_ms, waveform):
+        try:
+            self.jobs.put_nowait((session, item_id, waveform))
+        except queue.Full:
+            # Same as a real service under overload: the utterance is lost, not delayed forever
+            with self._lock:
+                self.stats["dropped_s"] += len(waveform) / SAMPLE_RATE
+            session.send({"type": "conversation.item.input_audio_transcription.failed", "item_id": item_id,
+                          "error": {"message": "transcription queue full"}})
+
+    def _asr_loop(self):
+        while True:
+            session, item_id, waveform = self.jobs.get()
+            start = time.perf_counter()
+            try:
+                self._transcribe(session, item_id, waveform)
+            except Exception as e:
+                # One bad utterance fails its item; the worker keeps serving the queue
+                print(f"❗ Stand-in transcription failed for {item_id}: {e}")
+                with self._lock:
+                    self.stats["failed"] += 1
+                session.send({"type": "conversation.item.input_audio_transcription.failed", "item_id": item_id,
+                              "error": {"message": str(e)}})
+                continue
+            with self._lock:
+                self.stats["utterances"] += 1
+                self.stats["asr_s"] += time.perf_counter() - start
+
+    def _transcribe(self, session, item_id, waveform):
+        segments, _ = self.rt_model.transcribe(
+            waveform,
+            beam_size=1,
+            temperature=0,
+            condition_on_previous_text=False,
+            vad_filter=False,
+            language=session.language,
+        )
+        text = ""
+        for s in segments:
+            text += s.text
+            session.send({"type": "conversation.item.input_audio_transcription.delta", "item_id": item_id,
+                          "delta": s.text})
+        session.send({"type": "conversation.item.input_audio_transcription.completed", "item_id": item_id,
+                      "transcript": text.strip()})
+
+    def health(self):
+        return {"queued": self.jobs.qsize(), "open_sessions": len(self.sessions), **self.stats}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_background(standin, port=None, host="127.0.0.1"):
+    # Returns (server, url); set server.should_exit = True to stop it
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(standin.app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="standin-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"ws://{host}:{port}/v1/realtime?intent=transcription"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the realtime transcription API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=ASR_WORKERS)
+    args = parser.parse_args()
+
+    standin = RealtimeStandin(workers=args.workers)
+    print(f"✅ Realtime stand-in on ws://{args.host}:{args.port}/v1/realtime")
+    uvicorn.run(standin.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
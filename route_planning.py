@@ -0,0 +1,141 @@
+# route_planning.py
+import re
+import math
+from collections import OrderedDict
+from shapely.geometry import Point
+
+from frequency_retrieval import (airport, get_airport_by_icao, get_frequencies, get_ordered_frequencies_by_leg,
+                                 create_nested_frequency_map, extract_frequency_roles)
+from flight_plan_utils import build_checklist_from_rules, inject_frequency_transitions
+from airspace_index import get_airspace_index
+import openaip_sync
+from position_reports import arrival_report
+from prompt_biasing import register_flight
+
+# Sample spacing along each leg in degrees (~5 km), at least MIN_POINTS_PER_SEGMENT per segment
+SAMPLE_SPACING_DEG = 0.05
+MIN_POINTS_PER_SEGMENT = 2
+
+COORD_RE = re.compile(r"^(?:(?P<name>[A-Za-z][\w\- ]*?)\s+)?(?P<lat>-?\d+(?:\.\d+)?)[\s,]+(?P<lon>-?\d+(?:\.\d+)?)$")
+
+
+def parse_waypoints(route):
+    # "EDFE; KILO 49.98 8.70; EDFQ; EDFN" -> list of waypoint dicts.
+    # Airports (ICAO codes) are stops, coordinates are reporting points.
+    if isinstance(route, str):
+        route = [part for part in re.split(r"[;\n]|->", route) if part.strip()]
+
+    waypoints = []
+    for item in route:
+        if isinstance(item, (tuple, list)):
+            lat, lon = item[:2]
+            waypoints.append({"name": f"{lat:.3f} {lon:.3f}", "lat": lat, "lon": lon, "stop": False})
+            continue
+
+        token = item.strip()
+        feature = get_airport_by_icao(token, airport) if len(token) == 4 else None
+        if feature:
+            lon, lat = feature["geometry"]["coordinates"][:2]
+            waypoints.append({"name": token.upper(), "lat": lat, "lon": lon, "stop": True, "feature": feature})
+            continue
+
+        m = COORD_RE.match(token)
+        if not m:
+            raise ValueError(f"Unknown waypoint: {token}")
+        lat, lon = float(m.group("lat")), float(m.group("lon"))
+        waypoints.append({"name": m.group("name") or f"{lat:.3f} {lon:.3f}", "lat": lat, "lon": lon, "stop": False})
+
+    return waypoints
+
+
+def split_legs(waypoints):
+    # A leg runs from one stop to the next, through any reporting points in between
+    if len(waypoints) < 2 or not waypoints[0]["stop"] or not waypoints[-1]["stop"]:
+        raise ValueError("Route must start and end at an airport")
+
+    legs, current = [], [waypoints[0]]
+    for wp in waypoints[1:]:
+        current.append(wp)
+        if wp["stop"]:
+            legs.append(current)
+            current = [wp]
+    return legs
+
+
+def sample_polyline(legs):
+    points, leg_ids = [], []
+    for leg_idx, leg in enumerate(legs):
+        for a, b in zip(leg, leg[1:]):
+            length = math.hypot(b["lon"] - a["lon"], b["lat"] - a["lat"])
+            n = max(MIN_POINTS_PER_SEGMENT, int(length / SAMPLE_SPACING_DEG))
+            for i in range(n):
+                t = i / n
+                points.append(Point(a["lon"] + t * (b["lon"] - a["lon"]), a["lat"] + t * (b["lat"] - a["lat"])))
+                leg_ids.append(leg_idx)
+        last = leg[-1]
+        points.append(Point(last["lon"], last["lat"]))
+        leg_ids.append(leg_idx)
+    return points, leg_ids
+
+
+def plan_multi_leg_route(cs, airplane_type, num_pax, route, position, cruise_altitude=None):
+    openaip_sync.refresh()
+    try:
+        legs = split_legs(parse_waypoints(route))
+    except ValueError as e:
+        return f"Error: {e}"
+
+    # All legs in one bulk spatial query
+    points, leg_ids = sample_polyline(legs)
+    airspace_index = get_airspace_index()
+    airspaces = airspace_index.airspaces
+    if cruise_altitude:
+        enroute_by_leg = airspace_index.frequencies_by_leg(points, leg_ids, cruise_altitude)
+    else:
+        enroute_by_leg = get_ordered_frequencies_by_leg(points, leg_ids, airspaces)
+
+    result = OrderedDict()
+    handoffs = []
+    all_freqs = OrderedDict()
+    last_fis = None
+
+    for leg_idx, (leg, enroute_freqs) in enumerate(zip(legs, enroute_by_leg)):
+        dep, arr = leg[0], leg[-1]
+        dep_freqs = get_frequencies(dep["feature"])
+        arr_freqs = get_frequencies(arr["feature"])
+        nested_freqs = create_nested_frequency_map(dep_freqs, arr_freqs, enroute_freqs)
+        roles = extract_frequency_roles(dep_freqs, arr_freqs, enroute_freqs)
+
+        for key in enroute_freqs:
+            if key != last_fis:
+                handoffs.append((leg_idx + 1, *key))
+                last_fis = key
+        all_freqs.update(nested_freqs)
+
+        user_data = {
+            "cs": cs,
+            "airplane_type": airplane_type,
+            "num_pax": int(num_pax),
+            "dep": dep["name"],
+            "arr": arr["name"],
+            "position": position if leg_idx == 0 else f"{dep['name']} apron",
+            "vorfeld": roles.get("vorfeld", ("", "")),
+            "info": roles.get("info", ("", "")),
+            "fis": roles.get("fis", []),
+            "arr_info": roles.get("arr_info", ("", "")),
+            # Inbound track from the last reporting point (or the departure) of this leg
+            "arrival_report": arrival_report((arr["lat"], arr["lon"]), (leg[-2]["lat"], leg[-2]["lon"]), cruise_altitude),
+        }
+
+        via = [wp["name"] for wp in leg[1:-1]]
+        title = f"Leg {leg_idx + 1}: {dep['name']} → {arr['name']}" + (f" via {', '.join(via)}" if via else "")
+        base = build_checklist_from_rules(user_data, airport=dep["name"])
+        result[title] = inject_frequency_transitions(base, nested_freqs)
+
+    register_flight(cs, airplane_type, legs[0][0]["name"], legs[-1][-1]["name"], position, all_freqs.keys())
+
+    print("Frequency handoffs:")
+    for leg_no, name, value in handoffs:
+        print(f"  leg {leg_no}: {name} {value} MHz")
+
+    return {"legs": result, "handoffs": handoffs}
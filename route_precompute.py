@@ -0,0 +1,202 @@
+# route_precompute.py
+import os
+import time
+import sqlite3
+import argparse
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+import msgpack
+import numpy as np
+from shapely.geometry import Point
+
+from airspace_index import load_airspaces
+import openaip_sync
+from frequency_retrieval import (airport, get_frequencies, generate_route_points, get_ordered_frequencies,
+                                 create_nested_frequency_map)
+
+ROUTE_DB = os.getenv("ATC_ROUTE_DB", "openaip_data/route_freqs.sqlite")
+EARTH_RADIUS_KM = 6371.0
+
+_airspaces = None
+
+
+def icao_airports(geojson=airport):
+    result = []
+    for feature in geojson["features"]:
+        icao = feature.get("properties", {}).get("icaoCode")
+        coords = feature.get("geometry", {}).get("coordinates", [])
+        if icao and len(coords) >= 2:
+            result.append((icao.upper(), coords[0], coords[1], get_frequencies(feature)))
+    return result
+
+
+def pairs_within_range(airports, max_range_km):
+    # Haversine distance matrix over all airports, upper triangle only
+    lon = np.radians([a[1] for a in airports])
+    lat = np.radians([a[2] for a in airports])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+    i, j = np.nonzero(np.triu(dist <= max_range_km, k=1))
+    return list(zip(i.tolist(), j.tolist()))
+
+
+def _pack_freq_map(freq_map):
+    # OrderedDict with (name, value) keys -> list, keeps order
+    return [[name, value, info] for (name, value), info in freq_map.items()]
+
+
+def _unpack_freq_map(rows):
+    return OrderedDict(((name, value), info) for name, value, info in rows)
+
+
+def _init_worker():
+    global _airspaces
+    _airspaces = load_airspaces()
+    _airspaces.sindex  # build the STRtree once per process
+
+
+def _compute_route(args):
+    dep, arr, num_points = args
+    dep_icao, dep_lon, dep_lat, dep_freqs = dep
+    arr_icao, arr_lon, arr_lat, arr_freqs = arr
+
+    route_points = generate_route_points(Point(dep_lon, dep_lat), Point(arr_lon, arr_lat), num_points)
+    enroute = get_ordered_frequencies(route_points, _airspaces)
+    nested = create_nested_frequency_map(dep_freqs, arr_freqs, enroute)
+
+    value = {
+        "dep_freqs": list(dep_freqs.items()),
+        "arr_freqs": list(arr_freqs.items()),
+        "enroute": _pack_freq_map(enroute),
+        "nested": _pack_freq_map(nested),
+    }
+    return f"{dep_icao}-{arr_icao}", msgpack.packb(value, use_bin_type=True)
+
+
+def _tasks(airports, pairs, num_points):
+    # Both directions: the nested map depends on which side departs
+    for i, j in pairs:
+        yield airports[i], airports[j], num_points
+        yield airports[j], airports[i], num_points
+
+
+def precompute_routes(out_path=ROUTE_DB, max_range_km=300, num_points=20, workers=None):
+    airports = icao_airports()
+    pairs = pairs_within_range(airports, max_range_km)
+    total = 2 * len(pairs)
+    print(f"Precomputing {total} routes between {len(airports)} airports (<= {max_range_km} km)")
+
+    tmp_path = f"{out_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    db.execute("CREATE TABLE routes (key TEXT PRIMARY KEY, value BLOB) WITHOUT ROWID")
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    db.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("max_range_km", str(max_range_km)), ("num_points", str(num_points)), ("created", str(time.time())),
+    ])
+
+    start = time.time()
+    done = 0
+    with mp.Pool(processes=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        rows = []
+        for key, value in pool.imap_unordered(_compute_route, _tasks(airports, pairs, num_points), chunksize=64):
+            rows.append((key, value))
+            done += 1
+            if len(rows) >= 2000:
+                db.executemany("INSERT OR REPLACE INTO routes VALUES (?, ?)", rows)
+                rows.clear()
+                print(f"  {done}/{total} routes ({done / (time.time() - start):.0f}/s)")
+        db.executemany("INSERT OR REPLACE INTO routes VALUES (?, ?)", rows)
+
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+    os.replace(tmp_path, out_path)  # readers never see a half-written file
+    print(f"Wrote {done} routes to {out_path} in {time.time() - start:.1f}s")
+
+
+_db = {"conn": None, "path": None, "version": None}
+_db_lock = threading.Lock()
+
+# Rows written before an OpenAIP sync may list outdated frequencies. They are bypassed
+# (callers compute the route live) until precompute_routes replaces the file.
+# version: the route file the marks apply to
+_stale = {"version": None, "all": False, "icaos": set()}
+
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _on_sync(dataset, changes, features):
+    with _db_lock:
+        if _stale["version"] is None:
+            _stale["version"] = _file_version(ROUTE_DB)
+        if dataset == "airspaces" or changes["removed"]:
+            # Enroute maps depend on airspaces along the whole route, and removed airports
+            # are no longer in the features to look their ICAO codes up
+            _stale["all"] = True
+        else:
+            ids = set(changes["added"]) | set(changes["changed"])
+            _stale["icaos"].update((f["properties"].get("icaoCode") or "").upper() for f in features
+                                   if f["properties"].get("_id") in ids)
+
+
+def _is_stale(version, dep_icao, arr_icao):
+    if _stale["version"] is not None and _stale["version"] != version:
+        # Rebuilt since the sync: the marks no longer apply
+        _stale.update(version=None, all=False, icaos=set())
+    return _stale["all"] or dep_icao in _stale["icaos"] or arr_icao in _stale["icaos"]
+
+
+def lookup_route(dep_icao, arr_icao, path=ROUTE_DB):
+    # Returns (dep_freqs, arr_freqs, enroute_freqs, nested_freqs) or None
+    # precompute_routes replaces the file with os.replace; an open connection would keep
+    # reading the old, unlinked inode, so reopen when the file behind the path changes
+    version = _file_version(path)
+    if version is None:
+        return None
+    dep_icao, arr_icao = dep_icao.upper(), arr_icao.upper()
+    with _db_lock:
+        if path == ROUTE_DB and _is_stale(version, dep_icao, arr_icao):
+            return None
+        if _db["conn"] is None or _db["path"] != path or _db["version"] != version:
+            if _db["conn"] is not None:
+                _db["conn"].close()
+            _db["conn"] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            _db["path"] = path
+            _db["version"] = version
+        row = _db["conn"].execute(
+            "SELECT value FROM routes WHERE key = ?", (f"{dep_icao}-{arr_icao}",)
+        ).fetchone()
+    if row is None:
+        return None
+
+    value = msgpack.unpackb(row[0], raw=False)
+    return (
+        OrderedDict(value["dep_freqs"]),
+        OrderedDict(value["arr_freqs"]),
+        _unpack_freq_map(value["enroute"]),
+        _unpack_freq_map(value["nested"]),
+    )
+
+
+openaip_sync.on_sync(_on_sync)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute enroute frequencies for all airport pairs")
+    parser.add_argument("--max-range-km", type=float, default=300)
+    parser.add_argument("--num-points", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=ROUTE_DB)
+    args = parser.parse_args()
+    precompute_routes(args.out, args.max_range_km, args.num_points, args.workers)
@@ -0,0 +1,211 @@
+# rule_packs.py
+# Phraseology rule packs loaded from rule_packs/<language>.json (and optional per-airport
+# overlays rule_packs/<language>_<ICAO>.json), compiled into matchers and templates.
+# Packs are re-read when a file changes; readers always see either the old or the new set.
+import os
+import re
+import json
+import time
+import threading
+from collections import namedtuple
+
+RULE_PACK_DIR = os.getenv("ATC_RULE_PACK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_packs"))
+RELOAD_INTERVAL = float(os.getenv("ATC_RULE_PACK_RELOAD_S", "2"))
+
+PACK_FILE_RE = re.compile(r"^(?P<language>[a-z]{2})(?:_(?P<airport>[A-Z0-9]{4}))?\.json$")
+PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+
+CompiledRule = namedtuple("CompiledRule", ["intent", "phase", "patterns", "pattern_re", "template"])
+
+
+class Template:
+    # "{name}" is a required value, "{ctx.key|ctx.other|default}" reads the transcript
+    # context with fallbacks and never fails
+    def __init__(self, text):
+        self.text = text
+        self.parts = []
+        required = []
+        pos = 0
+        for m in PLACEHOLDER_RE.finditer(text):
+            if m.start() > pos:
+                self.parts.append(text[pos:m.start()])
+            field = m.group(1).strip()
+            if field.startswith("ctx."):
+                options = field.split("|")
+                default = "" if options[-1].startswith("ctx.") else options.pop()
+                self.parts.append(("ctx", tuple(k[4:] for k in options), default))
+            else:
+                self.parts.append(("value", field))
+                if field not in required:
+                    required.append(field)
+            pos = m.end()
+        if pos < len(text):
+            self.parts.append(text[pos:])
+        self.required = tuple(required)
+
+    def missing(self, values):
+        return [name for name in self.required if name not in values]
+
+    def format(self, values, ctx=None):
+        ctx = ctx or {}
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] == "value":
+                out.append(f"{values[part[1]]}")
+            else:
+                out.append(next((f"{ctx[k]}" for k in part[1] if k in ctx), part[2]))
+        return "".join(out)
+
+
+def _compile_patterns(patterns):
+    # Same semantics as `pattern.lower() in transcript.lower()`, one search per intent
+    return re.compile("|".join(re.escape(p.lower()) for p in patterns))
+
+
+class CompiledPack:
+    def __init__(self, language, airport, data, source):
+        self.language = language
+        self.airport = airport
+        self.source = source
+        self.phase_order = data.get("phase_order", [])
+        self.rules = {}
+        for intent, rule in data["rules"].items():
+            self.rules[intent] = CompiledRule(
+                intent, rule.get("phase"), tuple(rule["patterns"]),
+                _compile_patterns(rule["patterns"]), Template(rule["template"]),
+            )
+        self.intents = list(self.rules)
+
+        # Matchers for FlightStateMachine; intents without a phase stay reachable everywhere
+        self.all = [(intent, rule.pattern_re) for intent, rule in self.rules.items()]
+        self.phase_of = {intent: rule.phase for intent, rule in self.rules.items()}
+        self.by_phase = {
+            phase: [(intent, rx) for intent, rx in self.all if self.phase_of[intent] in (phase, None)]
+            for phase in self.phase_order
+        }
+
+    def match(self, transcript):
+        # Stateless: first rule (declaration order) with a pattern in the transcript
+        text = transcript.lower()
+        for intent, rx in self.all:
+            if rx.search(text):
+                return intent
+        return None
+
+    def respond(self, intent, cs, ctx=None, **values):
+        # None when the rule needs a value the caller does not have
+        template = self.rules[intent].template
+        values["cs"] = cs
+        if template.missing(values):
+            return None
+        return template.format(values, ctx)
+
+    def legacy_rules(self):
+        # {intent: {"patterns", "response"}} in the shape of the old ICAO_RULES_* dicts;
+        # response(cs, ctx=..., **values) raises TypeError on missing values like the lambdas did
+        def make_response(rule):
+            def response(cs, ctx={}, **values):
+                values["cs"] = cs
+                missing = rule.template.missing(values)
+                if missing:
+                    raise TypeError(f"{rule.intent} missing required values: {', '.join(missing)}")
+                return rule.template.format(values, ctx)
+            return response
+
+        return {intent: {"patterns": list(rule.patterns), "response": make_response(rule)}
+                for intent, rule in self.rules.items()}
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_packs(directory=RULE_PACK_DIR):
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        m = PACK_FILE_RE.match(name)
+        if m:
+            files[(m.group("language"), m.group("airport"))] = os.path.join(directory, name)
+
+    packs = {}
+    base_data = {}
+    for (language, airport), path in files.items():
+        if airport is None:
+            base_data[language] = _read(path)
+            packs[(language, None)] = CompiledPack(language, None, base_data[language], path)
+
+    # Airport overlays replace or add rules by intent; a null rule removes it
+    for (language, airport), path in files.items():
+        if airport is None:
+            continue
+        if language not in base_data:
+            print(f"❗ Rule pack {path} has no base pack {language}.json, skipped")
+            continue
+        overlay = _read(path)
+        rules = dict(base_data[language]["rules"])
+        for intent, rule in overlay.get("rules", {}).items():
+            if rule is None:
+                rules.pop(intent, None)
+            else:
+                rules[intent] = {**rules.get(intent, {}), **rule}
+        data = {**base_data[language], "rules": rules}
+        packs[(language, airport)] = CompiledPack(language, airport, data, path)
+    return packs
+
+
+def _scan(directory):
+    return {name: os.stat(os.path.join(directory, name)).st_mtime_ns
+            for name in os.listdir(directory) if PACK_FILE_RE.match(name)}
+
+
+_state = {"packs": {}, "mtimes": None, "checked": 0.0}
+_reload_lock = threading.Lock()
+_listeners = []
+
+
+def on_reload(callback):
+    _listeners.append(callback)
+
+
+def reload_packs(directory=RULE_PACK_DIR, force=False):
+    with _reload_lock:
+        mtimes = _scan(directory)
+        if mtimes == _state["mtimes"] and not force:
+            return False
+        try:
+            packs = load_packs(directory)
+        except Exception as e:
+            if not _state["packs"]:
+                raise
+            print(f"❗ Rule pack reload failed, keeping previous packs: {e}")
+            _state["mtimes"] = mtimes  # don't retry the broken file until it changes again
+            return False
+        # Single reference swap: a reader holding the old dict keeps a consistent view
+        _state["packs"] = packs
+        _state["mtimes"] = mtimes
+        names = sorted(language + ("_" + airport if airport else "") for language, airport in packs)
+        print(f"Loaded rule packs: {', '.join(names)}")
+
+    for callback in _listeners:
+        callback(packs)
+    return True
+
+
+def get_pack(language="en", airport=None):
+    now = time.monotonic()
+    if now - _state["checked"] > RELOAD_INTERVAL:
+        _state["checked"] = now
+        try:
+            reload_packs()
+        except OSError as e:
+            print(f"❗ Could not scan rule packs: {e}")
+
+    packs = _state["packs"]
+    if airport:
+        pack = packs.get((language, airport.upper()))
+        if pack is not None:
+            return pack
+    return packs.get((language, None)) or packs[("en", None)]
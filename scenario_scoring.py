@@ -0,0 +1,253 @@
+# scenario_scoring.py
+# Batch scoring of student recordings against TRAINING_SCENARIOS:
+#   python scenario_scoring.py submissions.csv --workers 4 --out results.csv
+# submissions.csv columns: student, scenario_id, audio   (or pass a directory laid out
+# as <dir>/<student>/<scenario_id>.wav)
+import os
+import csv
+import time
+import argparse
+import statistics
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from training_scenarios import TRAINING_SCENARIOS
+from rule_packs import get_pack
+from flight_state import FlightStateMachine
+from transcription_utils import clean_transcript, extract_context_from_transcript
+from audio_io import load_audio
+
+SCENARIOS = {s["id"]: s for s in TRAINING_SCENARIOS}
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a")
+
+
+def check_scenarios(scenarios=TRAINING_SCENARIOS):
+    # Expectations that no rule can ever produce would score 0% for every student
+    for s in scenarios:
+        if s["expected_intent"] not in get_pack(s["language"]).rules:
+            print(f"❗ Scenario {s['id']}: expected intent '{s['expected_intent']}' has no {s['language'].upper()} rule")
+
+
+def load_submissions(source):
+    submissions = []
+    if os.path.isdir(source):
+        for student in sorted(os.listdir(source)):
+            student_dir = os.path.join(source, student)
+            if not os.path.isdir(student_dir):
+                continue
+            for name in sorted(os.listdir(student_dir)):
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in AUDIO_EXTENSIONS and stem.isdigit():
+                    submissions.append({"student": student, "scenario_id": int(stem), "audio": os.path.join(student_dir, name)})
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                audio = row["audio"] if os.path.isabs(row["audio"]) else os.path.join(base, row["audio"])
+                submissions.append({"student": row["student"], "scenario_id": int(row["scenario_id"]), "audio": audio})
+
+    unknown = [s for s in submissions if s["scenario_id"] not in SCENARIOS]
+    for s in unknown:
+        print(f"❗ Skipping {s['audio']}: unknown scenario {s['scenario_id']}")
+    return [s for s in submissions if s["scenario_id"] in SCENARIOS]
+
+
+def _norm(value):
+    return str(value).strip().lower().replace(" ", "")
+
+
+def score_transcript(transcript, scenario):
+    language = scenario["language"]
+    cleaned = clean_transcript(transcript)
+    context = extract_context_from_transcript(cleaned, language)
+    # The scenario puts the student in the phase of the expected call, as a live session would be
+    phase = get_pack(language).phase_of.get(scenario["expected_intent"])
+    intent = FlightStateMachine(language, phase).match(cleaned)
+
+    expected = scenario["expected_context"]
+    missing = [k for k in expected if k not in context]
+    wrong = [k for k in expected if k in context and _norm(context[k]) != _norm(expected[k])]
+    return {
+        "transcript": cleaned,
+        "intent": intent,
+        "context": context,
+        "intent_ok": intent == scenario["expected_intent"],
+        "context_hits": len(expected) - len(missing) - len(wrong),
+        "context_total": len(expected),
+        "missing": missing,
+        "wrong": wrong,
+    }
+
+
+def score_submissions(submissions, transcribe_batch_fn=None, pool=None, batch_size=8, io_workers=4):
+    # Audio is decoded on a thread pool while ASR runs either on an ASRWorkerPool
+    # (one future per clip) or in-process in batches via transcribe_batch_fn
+    # A clip that fails to decode or transcribe is recorded with its error; the rest still get scored
+    results = []
+    with ThreadPoolExecutor(max_workers=io_workers) as io:
+        decoded = io.map(_decode, submissions)
+
+        if pool is not None:
+            in_flight = {}
+            for sub, waveform, error in decoded:
+                if error is not None:
+                    results.append(_failed(sub, error))
+                    continue
+                # Keep the pool's queue bounded instead of failing with queue.Full
+                while len(in_flight) >= pool.max_queue:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results.append(_collect(future, *in_flight.pop(future)))
+                try:
+                    in_flight[pool.submit(waveform)] = (sub, time.perf_counter())
+                except Exception as e:
+                    results.append(_failed(sub, e))
+            for future in list(in_flight):
+                results.append(_collect(future, *in_flight.pop(future)))
+        else:
+            batch = []
+            for sub, waveform, error in decoded:
+                if error is not None:
+                    results.append(_failed(sub, error))
+                    continue
+                batch.append((sub, waveform))
+                if len(batch) >= batch_size:
+                    results.extend(_run_batch(batch, transcribe_batch_fn))
+                    batch = []
+            if batch:
+                results.extend(_run_batch(batch, transcribe_batch_fn))
+    return results
+
+
+def _decode(sub):
+    try:
+        return sub, load_audio(sub["audio"])[0], None
+    except Exception as e:
+        return sub, None, e
+
+
+def _collect(future, sub, start):
+    try:
+        return _finish(sub, start, future.result())
+    except Exception as e:
+        return _failed(sub, e)
+
+
+def _run_batch(batch, transcribe_batch_fn):
+    start = time.perf_counter()
+    try:
+        texts = transcribe_batch_fn([w for _, w in batch])
+    except Exception as e:
+        if len(batch) == 1:
+            return [_failed(batch[0][0], e)]
+        # Retry clip by clip so one bad recording doesn't fail the whole batch
+        print(f"❗ Batch of {len(batch)} failed ({e}), retrying one by one")
+        return [r for item in batch for r in _run_batch([item], transcribe_batch_fn)]
+    results = []
+    for (sub, _), text in zip(batch, texts):
+        try:
+            results.append(_finish(sub, start, text))
+        except Exception as e:
+            results.append(_failed(sub, e))
+    return results
+
+
+def _finish(sub, start, text):
+    latency = time.perf_counter() - start
+    result = score_transcript(text, SCENARIOS[sub["scenario_id"]])
+    result.update(sub)
+    result["latency_s"] = latency
+    result["error"] = None
+    return result
+
+
+def _failed(sub, error):
+    print(f"❗ {sub['student']} scenario {sub['scenario_id']} ({sub['audio']}): {error}")
+    return {**sub, "transcript": "", "intent": None, "context": {}, "intent_ok": False, "context_hits": 0,
+            "context_total": len(SCENARIOS[sub["scenario_id"]]["expected_context"]), "missing": [], "wrong": [],
+            "latency_s": None, "error": f"{type(error).__name__}: {error}"}
+
+
+def scenario_report(results):
+    by_scenario = defaultdict(list)
+    for r in results:
+        by_scenario[r["scenario_id"]].append(r)
+
+    report = OrderedDict()
+    for scenario_id in sorted(by_scenario):
+        # Failed submissions are counted, not scored: an unreadable file says nothing about the student
+        errors = sum(r["error"] is not None for r in by_scenario[scenario_id])
+        rows = [r for r in by_scenario[scenario_id] if r["error"] is None]
+        latencies = sorted(r["latency_s"] for r in rows)
+        slots_total = sum(r["context_total"] for r in rows)
+        n = len(rows) or 1
+        report[scenario_id] = {
+            "submissions": len(rows),
+            "errors": errors,
+            "intent_accuracy": sum(r["intent_ok"] for r in rows) / n,
+            "context_accuracy": sum(r["context_hits"] for r in rows) / slots_total if slots_total else 1.0,
+            "pass_rate": sum(r["intent_ok"] and r["context_hits"] == r["context_total"] for r in rows) / n,
+            "mean_latency_s": statistics.mean(latencies) if latencies else 0.0,
+            "p95_latency_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{'scenario':<10}{'n':>5}{'err':>5}{'intent':>9}{'context':>9}{'pass':>8}{'mean s':>9}{'p95 s':>8}")
+    for scenario_id, r in report.items():
+        print(f"{scenario_id:<10}{r['submissions']:>5}{r['errors']:>5}{r['intent_accuracy']:>9.0%}"
+              f"{r['context_accuracy']:>9.0%}{r['pass_rate']:>8.0%}{r['mean_latency_s']:>9.2f}{r['p95_latency_s']:>8.2f}")
+
+
+def write_results(results, path):
+    fields = ["student", "scenario_id", "audio", "transcript", "intent", "intent_ok",
+              "context_hits", "context_total", "missing", "wrong", "latency_s", "error"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for r in sorted(results, key=lambda r: (r["student"], r["scenario_id"])):
+            writer.writerow({**r, "missing": ";".join(r["missing"]), "wrong": ";".join(r["wrong"])})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score student recordings against the training scenarios")
+    parser.add_argument("submissions", help="CSV manifest or <dir>/<student>/<scenario_id>.wav tree")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="ASR worker processes (0 = in-process)")
+    parser.add_argument("--threads-per-worker", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--out", default=None, help="per-submission CSV")
+    args = parser.parse_args()
+
+    check_scenarios()
+    submissions = load_submissions(args.submissions)
+    print(f"Scoring {len(submissions)} submissions")
+
+    pool, transcribe_batch_fn = None, None
+    if args.workers > 0:
+        from asr_worker_pool import ASRWorkerPool
+        pool = ASRWorkerPool(num_workers=args.workers, threads_per_worker=args.threads_per_worker,
+                             max_batch_size=args.batch_size).start()
+    else:
+        from asr_models import load_hf_model, transcribe_batch
+        processor, model = load_hf_model()
+        transcribe_batch_fn = lambda waveforms: transcribe_batch(processor, model, waveforms)
+
+    start = time.time()
+    try:
+        results = score_submissions(submissions, transcribe_batch_fn, pool, args.batch_size)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    failed = sum(r["error"] is not None for r in results)
+    print(f"Scored {len(results) - failed} submissions in {time.time() - start:.1f}s" + (f", {failed} failed" if failed else ""))
+
+    print_report(scenario_report(results))
+    if args.out:
+        write_results(results, args.out)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
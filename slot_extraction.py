@@ -0,0 +1,160 @@
+# slot_extraction.py
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from icao_rules_en import WORD_TO_NUMBER_EN
+from icao_rules_de import WORD_TO_NUMBER_DE
+
+Slot = namedtuple("Slot", ["value", "text", "span"])
+
+SLOT_NAMES = ["runway", "qnh", "squawk", "taxiways", "hold_short_runway", "frequency"]
+
+# ATC pronunciations on top of the plain number words of both rule sets
+NUMBER_WORDS = {
+    **WORD_TO_NUMBER_EN,
+    **WORD_TO_NUMBER_DE,
+    "niner": "9", "tree": "3", "fife": "5", "fower": "4", "zwoo": "2",
+}
+DECIMAL_WORDS = {"decimal", "point", "komma", "."}
+
+TOKEN_RE = re.compile(r"\S+")
+
+# One alternation, scanned once. Hold-short only consumes its prefix and reads
+# the runway through a lookahead, so the same "runway 27" still fills the runway slot.
+SLOT_RE = re.compile(
+    r"(?P<hold>\bhold(?:ing)?\s+short\s+of|\bhalten?\s+(?:sie\s+)?vor(?:\s+der)?)"
+    r"(?=\s+(?:runway|piste)\s+(?P<hold_v>\d{2})(?!\d))"
+    r"|(?P<taxi>\b(?:via|über)\s+(?:taxiways?|rollwege?|rollbahn)\s+)"
+    r"(?P<taxi_v>[a-z\s\-&,]+?)"
+    r"(?=\s+(?:wind|qnh|short\s+of\s+runway|holding\s+short|runway|piste)\b|\s*$)"
+    r"|(?P<runway>\b(?:runway|piste)\s+)(?P<runway_v>\d{1,2})\b"
+    r"|(?P<qnh>\bqnh\s+)(?P<qnh_v>\d{3,4})\b"
+    r"|(?P<squawk>(?:squawk|code|transpondercode|transponder)\s+)(?P<squawk_v>\d{4})"
+    r"|\b(?P<frequency_v>\d{3}[.,]\d{1,3})\b",
+    re.IGNORECASE
+)
+
+TAXIWAY_RE = re.compile(r"\b[a-z]{1,2}\b")
+
+
+def normalize_numbers(transcript):
+    # Returns the normalized text plus, per output token, its start offset and
+    # the (start, end) span of the source words it came from.
+    out_tokens, out_starts, src_spans = [], [], []
+    pos = 0
+    run, run_start, run_end = [], None, None
+    run_open = False  # False after a multi-digit token: only a decimal may follow it
+
+    def emit(text, span):
+        nonlocal pos
+        out_starts.append(pos)
+        out_tokens.append(text)
+        src_spans.append(span)
+        pos += len(text) + 1
+
+    def flush_run():
+        nonlocal run, run_start, run_end
+        if run:
+            if run[-1] == ".":
+                run.pop()  # dangling decimal word ("runway two seven point")
+            emit("".join(run), (run_start, run_end))
+            run, run_start, run_end = [], None, None
+
+    for m in TOKEN_RE.finditer(transcript):
+        word = m.group(0)
+        lower = word.lower()
+        digit = NUMBER_WORDS.get(lower)
+        if digit is None and len(word) == 1 and word.isdigit():
+            digit = word
+
+        if digit is not None or (word.isdigit() and run and run[-1] == "."):
+            if not run_open:
+                flush_run()
+            if run_start is None:
+                run_start = m.start()
+            run.append(digit or word)
+            run_end = m.end()
+            run_open = digit is not None
+        elif word.isdigit():
+            flush_run()
+            run, run_start, run_end = [word], m.start(), m.end()
+            run_open = False
+        elif lower in DECIMAL_WORDS and run and "." not in run:
+            run.append(".")
+            run_end = m.end()
+            run_open = True
+        else:
+            flush_run()
+            emit(word, (m.start(), m.end()))
+    flush_run()
+
+    return " ".join(out_tokens), out_starts, src_spans
+
+
+def _source_span(start, end, out_starts, src_spans):
+    first = bisect_right(out_starts, start) - 1
+    last = bisect_right(out_starts, max(start, end - 1)) - 1
+    return src_spans[first][0], src_spans[last][1]
+
+
+def _slot_from_match(m):
+    if m.group("hold"):
+        value = m.group("hold_v")
+        return "hold_short_runway", Slot(value, value, m.span("hold_v"))
+    if m.group("taxi"):
+        taxiways = [tw.upper() for tw in TAXIWAY_RE.findall(m.group("taxi_v").lower())]
+        if not taxiways:
+            return None, None
+        return "taxiways", Slot(taxiways, ", ".join(taxiways), m.span("taxi_v"))
+    if m.group("runway"):
+        value = m.group("runway_v").zfill(2)  # Ensure '08' not '8'
+        return "runway", Slot(value, value, m.span("runway_v"))
+    if m.group("qnh"):
+        text = m.group("qnh_v")
+        return "qnh", Slot(int(text), text, m.span("qnh_v"))
+    if m.group("squawk"):
+        text = m.group("squawk_v")
+        return "squawk", Slot(text, text, m.span("squawk_v"))
+    text = m.group("frequency_v").replace(",", ".")  # German transcripts write 123,455
+    return "frequency", Slot(float(text), text, m.span("frequency_v"))
+
+
+def extract_slots(transcript, language="en"):
+    # language is accepted for symmetry with the rule sets; EN and DE
+    # number words and keywords are both understood in a single pass.
+    normalized, out_starts, src_spans = normalize_numbers(transcript)
+    slots = {}
+
+    for m in SLOT_RE.finditer(normalized):
+        name, slot = _slot_from_match(m)
+        if name is None or name in slots:
+            continue
+        span = _source_span(slot.span[0], slot.span[1], out_starts, src_spans)
+        slots[name] = slot._replace(span=span)
+        if len(slots) == len(SLOT_NAMES):
+            break
+
+    return slots
+
+
+def slots_to_context(slots):
+    return {name: slots[name].text for name in SLOT_NAMES if name in slots}
+
+
+def extract_slots_batch(transcripts, language="en"):
+    # Column-oriented output, one list per slot (None where missing), ready for
+    # pandas.DataFrame(...). Logged traffic repeats a lot, so identical
+    # transcripts are only parsed once.
+    columns = {name: [] for name in SLOT_NAMES}
+    memo = {}
+
+    for transcript in transcripts:
+        transcript = transcript or ""
+        slots = memo.get(transcript)
+        if slots is None:
+            slots = memo[transcript] = extract_slots(transcript, language)
+        for name in SLOT_NAMES:
+            slot = slots.get(name)
+            columns[name].append(slot.value if slot else None)
+
+    return columns
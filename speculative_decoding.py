@@ -0,0 +1,135 @@
+# speculative_decoding.py
+import os
+import time
+import threading
+import torch
+from transformers import WhisperProcessor, WhisperForConditionalGeneration
+
+from asr_models import SAMPLE_RATE, CPU_OPTIONS, optimize_for_cpu, transcribe_features
+
+# HF-format weights of the medium.en ATC model (RTModel is its CTranslate2 conversion)
+DRAFT_MODEL_ID = os.getenv("ATC_DRAFT_MODEL_ID", "jacktol/whisper-medium.en-fine-tuned-for-ATC")
+NUM_ASSISTANT_TOKENS = int(os.getenv("ATC_DRAFT_TOKENS", "5"))
+
+# Fall back to plain decoding after this many assisted failures, or when the drafter
+# is accepted so rarely that verifying its guesses costs more than it saves
+MAX_FAILURES = 3
+MIN_ACCEPTANCE = 0.2
+MIN_SAMPLES = 10
+
+
+def load_draft_model(model_id=DRAFT_MODEL_ID):
+    processor = WhisperProcessor.from_pretrained(model_id)
+    model = WhisperForConditionalGeneration.from_pretrained(model_id)
+    model.generation_config.forced_decoder_ids = None
+    model.eval()
+    # The drafter gets the same CPU treatment as the main model, minus warmup
+    model = optimize_for_cpu(processor, model, **{**CPU_OPTIONS, "warmup": False, "num_threads": None})
+    return processor, model
+
+
+class _ForwardCounter:
+    def __init__(self, module):
+        self.calls = 0
+        self._handle = module.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+
+class SpeculativeTranscriber:
+    def __init__(self, processor, model, draft_processor, draft_model, num_assistant_tokens=NUM_ASSISTANT_TOKENS):
+        self.processor = processor
+        self.model = model
+        self.draft_processor = draft_processor
+        self.draft_model = draft_model
+        self.draft_model.generation_config.num_assistant_tokens = num_assistant_tokens
+
+        # Same vocabulary -> classic assisted generation. Otherwise (e.g. medium.en drafting
+        # for multilingual large-v3) transformers re-tokenizes between the two models.
+        self.same_tokenizer = draft_processor.tokenizer.get_vocab() == processor.tokenizer.get_vocab()
+
+        # medium.en takes 80 mel bins, large-v3-turbo 128: the drafter then needs its own
+        # features and encoder pass, handed to generate as assistant_encoder_outputs
+        self.same_features = draft_model.config.num_mel_bins == model.config.num_mel_bins
+        if not self.same_features:
+            print(f"Draft model uses {draft_model.config.num_mel_bins} mel bins, main model "
+                  f"{model.config.num_mel_bins}: drafter gets its own features")
+
+        self.enabled = True
+        self.failures = 0
+        self.stats = {"calls": 0, "assisted": 0, "fallbacks": 0, "rounds": 0, "drafted": 0, "accepted": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+        self._main_decoder = _ForwardCounter(model.get_decoder())
+        self._draft_decoder = _ForwardCounter(draft_model.get_decoder())
+
+    def _draft_encoder_outputs(self, waveform, sampling_rate):
+        features = self.draft_processor.feature_extractor(
+            waveform, sampling_rate=sampling_rate, return_tensors="pt"
+        ).input_features.to(self.draft_model.dtype)
+        return self.draft_model.get_encoder()(features)
+
+    def _assisted_kwargs(self, waveform, sampling_rate):
+        kwargs = {"assistant_model": self.draft_model}
+        if not self.same_features:
+            kwargs["assistant_encoder_outputs"] = self._draft_encoder_outputs(waveform, sampling_rate)
+        if not self.same_tokenizer:
+            kwargs["tokenizer"] = self.processor.tokenizer
+            kwargs["assistant_tokenizer"] = self.draft_processor.tokenizer
+        return kwargs
+
+    def acceptance_rate(self):
+        return self.stats["accepted"] / self.stats["drafted"] if self.stats["drafted"] else 0.0
+
+    def transcribe(self, waveform, sampling_rate=SAMPLE_RATE, input_features=None, **generate_kwargs):
+        # Assisted generation works on a single sequence, one clip at a time.
+        # The counters are shared, so concurrent calls are serialized.
+        if input_features is None:
+            input_features = self.processor(waveform, sampling_rate=sampling_rate, return_tensors="pt").input_features
+        input_features = torch.as_tensor(input_features)
+
+        with self._lock:
+            self.stats["calls"] += 1
+            if not self.enabled or (waveform is None and not self.same_features):
+                # No audio to build the drafter's features from: plain decoding for this clip
+                self.stats["fallbacks"] += 1
+                return transcribe_features(self.processor, self.model, input_features, **generate_kwargs)[0]
+
+            self._main_decoder.reset()
+            self._draft_decoder.reset()
+            start = time.perf_counter()
+            try:
+                with torch.inference_mode():
+                    predicted_ids = self.model.generate(input_features, **self._assisted_kwargs(waveform, sampling_rate),
+                                                        **generate_kwargs)
+            except Exception as e:
+                self.failures += 1
+                self.stats["fallbacks"] += 1
+                print(f"❗ Speculative decoding failed ({e}), falling back to plain decoding")
+                if self.failures >= MAX_FAILURES:
+                    self.enabled = False
+                return transcribe_features(self.processor, self.model, input_features, **generate_kwargs)[0]
+
+            self._record(predicted_ids, time.perf_counter() - start)
+            return self.processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
+
+    def _record(self, predicted_ids, seconds):
+        # Estimated from forward calls: every verification round is one main-decoder call
+        # and adds (accepted drafts + 1) tokens; every drafted token is one drafter call.
+        eos = self.processor.tokenizer.eos_token_id
+        new_tokens = int((predicted_ids[0] < eos).sum()) + 1
+        rounds = self._main_decoder.calls
+        drafted = self._draft_decoder.calls
+
+        self.stats["assisted"] += 1
+        self.stats["seconds"] += seconds
+        self.stats["rounds"] += rounds
+        self.stats["drafted"] += drafted
+        self.stats["accepted"] += max(0, min(drafted, new_tokens - rounds))
+
+        if self.stats["assisted"] >= MIN_SAMPLES and self.acceptance_rate() < MIN_ACCEPTANCE:
+            print(f"❗ Draft acceptance {self.acceptance_rate():.0%} too low, disabling speculative decoding")
+            self.enabled = False
@@ -0,0 +1,78 @@
+# tests/test_asr_worker_pool.py
+# Respawn path of ASRWorkerPool with a stand-in worker, so no model is loaded.
+import os
+import sys
+import time
+import signal
+import pytest
+
+pytest.importorskip("transformers")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asr_worker_pool
+
+
+def _fake_worker(idx, gen, task_queue, result_queue, model_id, num_threads):
+    # Exits instead of loading anything when the preloaded weights were not inherited
+    if model_id not in asr_worker_pool._PRELOADED:
+        os._exit(3)
+    result_queue.put(("ready", idx, gen, None, None))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, waveforms, _ = task
+        result_queue.put(("result", idx, gen, batch_id, [f"{idx}/{gen}"] * len(waveforms)))
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def _children_of(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    stat = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(stat[1]) == pid and stat[0] != "Z":
+                children.append(int(entry))
+    return children
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_killed_worker_gets_exactly_one_replacement(monkeypatch):
+    loads = []
+    monkeypatch.setattr(asr_worker_pool, "HEARTBEAT_INTERVAL", 0.2)
+    monkeypatch.setattr(asr_worker_pool, "_worker_main", _fake_worker)
+    monkeypatch.setattr(asr_worker_pool, "load_hf_model", lambda *a, **k: loads.append(a) or ("processor", "model"))
+    monkeypatch.setattr(asr_worker_pool, "_PRELOADED", {})
+
+    pool = asr_worker_pool.ASRWorkerPool(num_workers=2, share_model=True).start()
+    try:
+        assert _wait_for(lambda: all(w.ready for w in pool._workers))
+        victim, other = pool._workers
+        old_pid, other_pid = victim.process.pid, other.process.pid
+        spawned_before = _children_of(pool._spawner.pid)
+
+        os.kill(old_pid, signal.SIGKILL)
+        assert _wait_for(lambda: victim.restarts == 1 and victim.ready)
+        time.sleep(1.0)  # a few more monitor rounds: nothing else may get started
+
+        assert victim.restarts == 1 and other.restarts == 0
+        assert victim.process.pid != old_pid and victim.process.is_alive()
+        assert other.process.pid == other_pid
+        assert _children_of(pool._spawner.pid) == spawned_before + [victim.process.pid]
+        # Weights were loaded once, in the parent; the replacement inherited them
+        assert len(loads) == 1
+        assert pool.transcribe([0.0] * 160, timeout=5) in ("0/2", "1/1")
+    finally:
+        pool.shutdown()
@@ -0,0 +1,113 @@
+# transcript_cache.py
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+CACHE_DIR = os.getenv("ATC_CACHE_DIR", "transcript_cache")
+PRUNE_EVERY = 100
+
+
+def audio_fingerprint(waveform, model_id, params=None):
+    # Content address: decoded PCM + model + every parameter that changes the output
+    h = hashlib.blake2b(digest_size=20)
+    h.update(memoryview(np.ascontiguousarray(waveform, dtype=np.float32)).cast("B"))
+    h.update(model_id.encode("utf-8"))
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class TranscriptCache:
+    def __init__(self, max_entries=512, cache_dir=CACHE_DIR, max_disk_entries=20000):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, value):
+        # Caller holds the lock
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._memory[key]
+
+        value = None
+        if self.cache_dir:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self._puts += 1
+            prune = self._puts % PRUNE_EVERY == 0
+
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Drop least recently written files once the disk tier grows past its limit
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+        for _, path in sorted(entries)[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
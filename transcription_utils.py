@@ -2,6 +2,8 @@
 import re
 from icao_rules_en import ICAO_RULES_EN, WORD_TO_NUMBER_EN
 from icao_rules_de import ICAO_RULES_DE, WORD_TO_NUMBER_DE
+from slot_extraction import extract_slots, slots_to_context
+from rule_packs import get_pack
 
 ICAO_TO_LETTER = {
     "alfa": "A", "bravo": "B", "charlie": "C", "delta": "D", "echo": "E",
@@ -98,54 +100,8 @@ def clean_transcript(transcript):
     return " ".join(cleaned)
 
 def extract_context_from_transcript(transcript, language="en"):
-    context = {}
-    transcript_lc = transcript.lower()
-
-    # Load number conversion
-    if language == "de":
-        from icao_rules_de import words_to_number_de
-        words_to_number = words_to_number_de
-    else:
-        from icao_rules_en import words_to_number_en
-        words_to_number = words_to_number_en
-
-    # --- Runway ---
-    runway_matches = re.findall(r"runway\s+(\d{1,2})\b", transcript_lc)
-    if runway_matches:
-        context["runway"] = runway_matches[0].zfill(2)  # Ensure '08' not '8'
-
-    # --- QNH ---
-    qnh_match = re.search(r"qnh\s+(\d{3,4})\b", transcript_lc)
-    if qnh_match:
-        context["qnh"] = qnh_match.group(1)
-
-    # --- Squawk ---
-    squawk_match = re.search(r"(?:squawk|code|transpondercode)\s+(\d{4})", transcript_lc)
-    if squawk_match:
-        context["squawk"] = squawk_match.group(1)
-
-    # --- Taxiways ---
-    taxi_match = re.search(
-        r"(?:via\s+taxiways?\s+)([a-z\s\-&]+?)(?=\s+(?:wind|qnh|short of runway|holding short|runway|\Z))",
-        transcript_lc
-    )
-    if taxi_match:
-        taxi_raw = taxi_match.group(1)
-        taxiways = re.findall(r"\b[a-z]{1,2}\b", taxi_raw)  # Match A, B, NB, etc.
-        if taxiways:
-            context["taxiways"] = ", ".join(tw.upper() for tw in taxiways)
-
-    # --- Hold short ---
-    hold_match = re.search(r"hold(?:ing)? short of runway\s+(\d{2})", transcript_lc)
-    if hold_match:
-        context["hold_short_runway"] = hold_match.group(1)
-
-    # --- Frequency ---
-    freq_match = re.search(r"\b(\d{3}\.\d{1,3})\b", transcript)
-    if freq_match:
-        context["frequency"] = freq_match.group(1)
-
-    return context
+    # All slots are filled in one scan; see slot_extraction for typed values and spans
+    return slots_to_context(extract_slots(transcript, language))
 
 def callsign_matches(full, heard):
     def strip(c): return c.replace("-", "").upper()
@@ -183,19 +139,23 @@ def strip_callsign_from_transcript(transcript, callsign, phonetic_map):
     cleaned_text = " ".join(words[len(letters):]).strip()
     return cleaned_text
 
-def get_icao_response(transcript, callsign, context={}, language="en"):
-    rules = ICAO_RULES_EN if language == "en" else ICAO_RULES_DE
-
-    for intent, rule in rules.items():
-        for pattern in rule["patterns"]:
-            if pattern.lower() in transcript.lower():
-                try:
-                    response = rule["response"](callsign.upper(), ctx=context)
-                    return response, intent
-                except TypeError as e:
-                    print("Missing context for rule:", e)
-                    cleaned = strip_callsign_from_transcript(transcript, callsign, ICAO_TO_LETTER)
-                    return f"{cleaned} — {callsign.upper()}", None
+def get_icao_response(transcript, callsign, context={}, language="en", session=None, airport=None, values=None):
+    # values: flight data for templates that need more than the callsign (e.g. fis2, squawk)
+    pack = session.pack if session is not None else get_pack(language, airport)
+
+    # A flight session only evaluates intents reachable from its current phase
+    matched = session.match(transcript) if session is not None else pack.match(transcript)
+
+    if matched is not None and matched in pack.rules:
+        values = dict(values or {})
+        if "fis2" in pack.rules[matched].template.required and "fis2" not in values and context.get("frequency"):
+            # "contact ... on 123.455": the next station comes from the reverse frequency index
+            from frequency_index import resolve_station
+            values["fis2"] = resolve_station(context["frequency"], transcript)
+        response = pack.respond(matched, callsign.upper(), context, **values)
+        if response is not None:
+            return response, matched
+        print(f"Missing context for rule {matched}:", pack.rules[matched].template.missing({"cs": callsign, **values}))
 
     cleaned = strip_callsign_from_transcript(transcript, callsign, ICAO_TO_LETTER)
     return f"{cleaned} — {callsign.upper()}", None
@@ -0,0 +1,200 @@
+# transmission_log.py
+# Append-only transmission store: SQLite in WAL mode with an FTS5 index over the text.
+# Requests only enqueue; one background thread writes in batched transactions.
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+
+LOG_DB = os.getenv("ATC_LOG_DB", "transmission_log.sqlite")
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transmissions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT,
+    source TEXT,
+    frequency TEXT,
+    callsign TEXT,
+    transcript TEXT,
+    intent TEXT,
+    response TEXT,
+    context TEXT,
+    asr_ms REAL,
+    total_ms REAL
+);
+CREATE INDEX IF NOT EXISTS ix_transmissions_ts ON transmissions(ts);
+CREATE INDEX IF NOT EXISTS ix_transmissions_callsign ON transmissions(callsign);
+CREATE INDEX IF NOT EXISTS ix_transmissions_intent ON transmissions(intent);
+CREATE INDEX IF NOT EXISTS ix_transmissions_frequency ON transmissions(frequency);
+CREATE INDEX IF NOT EXISTS ix_transmissions_session ON transmissions(session);
+CREATE VIRTUAL TABLE IF NOT EXISTS transmissions_fts USING fts5(
+    transcript, response, content='transmissions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS transmissions_ai AFTER INSERT ON transmissions BEGIN
+    INSERT INTO transmissions_fts(rowid, transcript, response) VALUES (new.id, new.transcript, new.response);
+END;
+"""
+
+COLUMNS = ["ts", "session", "source", "frequency", "callsign", "transcript", "intent", "response", "context", "asr_ms", "total_ms"]
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable except on power loss
+    return conn
+
+
+def _normalize_callsign(callsign):
+    return callsign.replace("-", "").upper() if callsign else None
+
+
+def _fts_query(text):
+    # Every word as a quoted prefix term, so user input can't break the FTS syntax
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+class TransmissionLog:
+    def __init__(self, path=LOG_DB, max_queue=10000):
+        self.path = path
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._readers = threading.local()
+        self._stop = threading.Event()
+        self.stats = {"written": 0, "dropped": 0, "batches": 0}
+        self._writer = threading.Thread(target=self._write_loop, name="transmission-log", daemon=True)
+        self._writer.start()
+
+    def log(self, callsign=None, transcript="", intent=None, response=None, context=None,
+            session=None, source=None, frequency=None, asr_ms=None, total_ms=None, ts=None):
+        row = (
+            ts or time.time(), session, source, frequency, _normalize_callsign(callsign), transcript,
+            intent, response, json.dumps(context or {}, ensure_ascii=False), asr_ms, total_ms,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Never block a request on logging
+            self.stats["dropped"] += 1
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        insert = f"INSERT INTO transmissions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                rows = [self._queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(rows) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(insert, rows)
+                self.stats["written"] += len(rows)
+                self.stats["batches"] += 1
+            except sqlite3.Error as e:
+                self.stats["dropped"] += len(rows)
+                print(f"❗ Transmission log write failed: {e}")
+        conn.close()
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        self._writer.join(timeout)
+
+    def _reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._readers.conn = conn
+        return conn
+
+    def search(self, callsign=None, intent=None, frequency=None, text=None, session=None,
+               since=None, until=None, limit=100):
+        # Newest first. The log is append-only, so rowid order is time order and
+        # both the FTS5 index and the column indexes can be walked backwards with LIMIT.
+        where, params = [], []
+        if text:
+            sql = "SELECT t.* FROM transmissions_fts f JOIN transmissions t ON t.id = f.rowid"
+            where.append("transmissions_fts MATCH ?")
+            params.append(_fts_query(text))
+            order = "f.rowid"
+        else:
+            sql = "SELECT t.* FROM transmissions t"
+            order = "t.id"
+        for column, value in (("callsign", _normalize_callsign(callsign)), ("intent", intent),
+                              ("frequency", frequency), ("session", session)):
+            if value:
+                where.append(f"t.{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("t.ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("t.ts < ?")
+            params.append(until)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(int(limit))
+
+        rows = []
+        for row in self._reader().execute(sql, params):
+            entry = dict(row)
+            entry["context"] = json.loads(entry["context"]) if entry["context"] else {}
+            rows.append(entry)
+        return rows
+
+    def counts(self):
+        row = self._reader().execute("SELECT COUNT(*), MIN(ts), MAX(ts) FROM transmissions").fetchone()
+        return {"rows": row[0], "first": row[1], "last": row[2], "queued": self._queue.qsize(), **self.stats}
+
+
+def format_rows(rows):
+    lines = []
+    for r in rows:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["ts"]))
+        freq = f" [{r['frequency']}]" if r["frequency"] else ""
+        lines.append(f"{stamp}{freq} {r['callsign'] or '?'} ({r['intent'] or '-'}): {r['transcript']}")
+        if r["response"]:
+            lines.append(f"    → {r['response']}")
+    return "\n".join(lines)
+
+
+_log = {"instance": None}
+_log_lock = threading.Lock()
+
+
+def get_transmission_log(path=LOG_DB):
+    # One log (and writer thread) per process, created on first use
+    with _log_lock:
+        if _log["instance"] is None:
+            _log["instance"] = TransmissionLog(path)
+        return _log["instance"]
+
+
+def _after_fork():
+    # A forked worker inherits the parent's log object but not its writer thread:
+    # rows queued there would never be written, so the child starts its own on first use
+    global _log_lock
+    _log_lock = threading.Lock()
+    _log["instance"] = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)